@@ -0,0 +1,142 @@
+"""Local store for landmark/background images used by the photo pipeline.
+
+Each background is fetched and decoded once per worker. Scaled variants
+(built on first use, or at load for ``variant_widths``) and the colour
+statistics that compositing samples are then kept in memory, so repeat
+requests for the same landmark do no network I/O and no decoding. ``cache_dir`` also keeps the raw bytes on local disk,
+which survives restarts and is shared by every worker on the host.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from singleflight import SingleFlight
+
+
+class BackgroundAsset:
+    def __init__(self, url, data, variant_widths=()):
+        self.url = url
+        self.size_bytes = len(data)
+        self.image = Image.open(io.BytesIO(data)).convert("RGBA")
+        self._variants = {}
+        self._bands = {}
+        self._lock = threading.Lock()
+        for width in variant_widths:
+            self.variant(width)
+
+    def variant(self, max_width=None):
+        """The image scaled down to ``max_width`` (the original if it is already narrower)."""
+        if not max_width or max_width >= self.image.width:
+            return self.image
+        with self._lock:
+            image = self._variants.get(max_width)
+            if image is None:
+                height = round(self.image.height * max_width / self.image.width)
+                image = self.image.resize((max_width, height), Image.LANCZOS)
+                self._variants[max_width] = image
+        return image
+
+    def region_mean(self, image, box):
+        """Average RGB of ``image`` (one of this asset's variants) inside ``box``.
+
+        Compositing always samples the same band of rows for a given image
+        size, so per-column sums of that band are computed once and every
+        later lookup is O(1) whatever the person's width.
+        """
+        left, top, right, bottom = box
+        key = (image.size, top, bottom)
+        with self._lock:
+            prefix = self._bands.get(key)
+        if prefix is None:
+            band = np.asarray(image.crop((0, top, image.width, bottom)).convert("RGB"), dtype=np.int64)
+            prefix = np.zeros((image.width + 1, 3), dtype=np.int64)
+            np.cumsum(band.sum(axis=0), axis=0, out=prefix[1:])
+            with self._lock:
+                self._bands[key] = prefix
+        count = (right - left) * (bottom - top)
+        if count <= 0:
+            return (0, 0, 0)
+        return tuple(int(x) for x in (prefix[right] - prefix[left]) / count)
+
+
+class BackgroundAssetStore:
+    def __init__(self, fetch, max_assets=32, variant_widths=(), cache_dir=None):
+        self.fetch = fetch  # url -> bytes
+        self.max_assets = max_assets
+        self.variant_widths = tuple(variant_widths)
+        self.cache_dir = cache_dir
+        self._assets = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.disk_hits = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, url):
+        with self._lock:
+            asset = self._assets.get(url)
+            if asset is not None:
+                self._assets.move_to_end(url)
+                self.hits += 1
+                return asset
+            self.misses += 1
+
+        return self._loads.do(url, lambda: self._load(url))
+
+    def _disk_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def _load(self, url):
+        data = None
+        if self.cache_dir and os.path.exists(self._disk_path(url)):
+            with open(self._disk_path(url), "rb") as f:
+                data = f.read()
+            self.disk_hits += 1
+        if data is None:
+            data = self.fetch(url)
+            self.downloads += 1
+            if self.cache_dir:
+                tmp_path = f"{self._disk_path(url)}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._disk_path(url))
+
+        asset = BackgroundAsset(url, data, self.variant_widths)
+        with self._lock:
+            self._assets[url] = asset
+            while len(self._assets) > self.max_assets:
+                self._assets.popitem(last=False)
+        return asset
+
+    def preload(self, urls):
+        """Fetch ``urls`` in a background thread, ignoring failures."""
+        def run():
+            for url in urls:
+                try:
+                    self.get(url)
+                except Exception as e:
+                    print(f"Could not preload background {url}: {e}")
+
+        thread = threading.Thread(target=run, name="background-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "hits": self.hits,
+                "misses": self.misses,
+                "downloads": self.downloads,
+                "diskHits": self.disk_hits,
+            }
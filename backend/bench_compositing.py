@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Benchmark the compositing pipeline against the original full-frame PIL version.
+
+Runs both on synthetic backgrounds at several sizes, prints per-stage
+timings and checks the outputs match within tolerance.
+
+Usage: python bench_compositing.py [repeats]
+"""
+
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageStat
+
+from compositing import composite_travel_photo
+
+SIZES = [(800, 533), (1600, 1067), (3840, 2160)]
+MAX_MEAN_DIFF = 0.5  # average per-channel difference, 0-255 scale
+MAX_PIXEL_DIFF = 8
+
+
+def legacy_composite(user_image_no_bg, background_image, timings):
+    """The original generate_travel_photo compositing, with stage timers added."""
+    t = time.perf_counter()
+    bg_width, bg_height = background_image.size
+    fg_height = int(bg_height * 0.55)
+    fg_width = int(user_image_no_bg.width * (fg_height / user_image_no_bg.height))
+    user_image_resized = user_image_no_bg.resize((fg_width, fg_height), Image.LANCZOS)
+    paste_x = (bg_width - fg_width) // 2
+    paste_y = bg_height - fg_height - int(bg_height * 0.03)
+    composite_image = Image.new("RGBA", background_image.size)
+    composite_image.paste(background_image, (0, 0))
+    timings["resize"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    shadow = Image.new('RGBA', user_image_resized.size, (0, 0, 0, 120))
+    shadow.putalpha(user_image_resized.split()[3])
+    shadow_layer = Image.new('RGBA', background_image.size, (0, 0, 0, 0))
+    shadow_layer.paste(shadow, (paste_x + 10, paste_y + 12), shadow)
+    shadow_layer = shadow_layer.filter(ImageFilter.GaussianBlur(20))
+    timings["shadow"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    ao_shadow = Image.new('RGBA', (fg_width, int(fg_height * 0.15)), (0, 0, 0, 80))
+    ao_mask = Image.new('L', ao_shadow.size, 0)
+    ImageDraw.Draw(ao_mask).ellipse([0, 0, fg_width, int(fg_height * 0.15)], fill=255)
+    ao_shadow.putalpha(ao_mask)
+    ao_shadow = ao_shadow.filter(ImageFilter.GaussianBlur(15))
+    ao_layer = Image.new('RGBA', background_image.size, (0, 0, 0, 0))
+    ao_layer.paste(ao_shadow, (paste_x, paste_y + fg_height - int(fg_height * 0.08)), ao_shadow)
+    timings["ambient_occlusion"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    sample_region = background_image.crop((
+        max(0, paste_x - 50),
+        max(0, paste_y - 50),
+        min(bg_width, paste_x + fg_width + 50),
+        min(bg_height, paste_y + fg_height + 50)
+    ))
+    bg_avg = tuple(int(x) for x in ImageStat.Stat(sample_region.convert('RGB')).mean)
+    person_rgb = user_image_resized.convert('RGB')
+    person_tinted = Image.blend(person_rgb, Image.new('RGB', person_rgb.size, bg_avg), 0.15)
+    person_tinted = person_tinted.convert('RGBA')
+    person_tinted.putalpha(user_image_resized.split()[3])
+    composite_image = Image.alpha_composite(composite_image, shadow_layer)
+    composite_image = Image.alpha_composite(composite_image, ao_layer)
+    composite_image.paste(person_tinted, (paste_x, paste_y), person_tinted)
+    timings["tint"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    edge_glow = person_tinted.filter(ImageFilter.GaussianBlur(3))
+    edge_glow = ImageEnhance.Brightness(edge_glow).enhance(1.3)
+    glow_layer = Image.new('RGBA', background_image.size, (0, 0, 0, 0))
+    glow_layer.paste(edge_glow, (paste_x, paste_y), edge_glow)
+    composite_image = Image.alpha_composite(glow_layer, composite_image)
+    timings["edge_glow"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    final_image = Image.new("RGB", composite_image.size, (255, 255, 255))
+    final_image.paste(composite_image, (0, 0), composite_image)
+    final_image = ImageEnhance.Color(final_image).enhance(1.15)
+    final_image = ImageEnhance.Contrast(final_image).enhance(1.08)
+    final_image = ImageEnhance.Sharpness(final_image).enhance(1.2)
+    timings["grading"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    vignette = Image.new('L', final_image.size, 255)
+    draw = ImageDraw.Draw(vignette)
+    for i in range(min(bg_width, bg_height) // 4):
+        alpha = int(255 * (1 - i / (min(bg_width, bg_height) / 4) * 0.3))
+        draw.rectangle([i, i, bg_width-i, bg_height-i], outline=alpha)
+    vignette = vignette.filter(ImageFilter.GaussianBlur(bg_width // 20))
+    final_image = Image.composite(final_image, Image.new('RGB', final_image.size, (0, 0, 0)), vignette)
+    timings["vignette"] = time.perf_counter() - t
+    return final_image
+
+
+def synthetic_background(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    pixels = np.stack([120 + 100 * x + 0 * y, 90 + 120 * y + 0 * x, 200 - 80 * x * y], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape)
+    rgb = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode="RGB")
+    return rgb.convert("RGBA")
+
+
+def synthetic_person(width=600, height=900):
+    person = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(person)
+    draw.ellipse([width * 0.3, 0, width * 0.7, height * 0.3], fill=(220, 180, 150, 255))
+    draw.rectangle([width * 0.2, height * 0.28, width * 0.8, height], fill=(40, 70, 160, 255))
+    # Soft matte edges like rembg produces
+    alpha = person.getchannel("A").filter(ImageFilter.GaussianBlur(4))
+    person.putalpha(alpha)
+    return person
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    person = synthetic_person()
+    failed = False
+
+    for width, height in SIZES:
+        background = synthetic_background(width, height)
+        legacy_times, new_times = {}, {}
+        for _ in range(repeats):
+            stage_times = {}
+            expected = legacy_composite(person, background, stage_times)
+            for stage, seconds in stage_times.items():
+                legacy_times[stage] = legacy_times.get(stage, 0.0) + seconds / repeats
+        # The first call builds the cached vignette and AO masks; report it separately
+        cold = {}
+        composite_travel_photo(person, background, timings=cold)
+        for _ in range(repeats):
+            stage_times = {}
+            actual = composite_travel_photo(person, background, timings=stage_times)
+            for stage, seconds in stage_times.items():
+                new_times[stage] = new_times.get(stage, 0.0) + seconds / repeats
+
+        diff = np.abs(np.asarray(expected, dtype=np.int16) - np.asarray(actual, dtype=np.int16))
+        print(f"\n{width}x{height}: mean diff {diff.mean():.4f}, max diff {diff.max()}")
+        print(f"{'stage':<20}{'legacy ms':>12}{'new ms':>12}{'cold ms':>12}{'speedup':>10}")
+        for stage in legacy_times:
+            old, new = legacy_times[stage] * 1000, new_times.get(stage, 0.0) * 1000
+            speedup = f"{old / new:.1f}x" if new else "-"
+            print(f"{stage:<20}{old:>12.2f}{new:>12.2f}{cold.get(stage, 0.0) * 1000:>12.2f}{speedup:>10}")
+        old_total, new_total = sum(legacy_times.values()) * 1000, sum(new_times.values()) * 1000
+        print(f"{'total':<20}{old_total:>12.2f}{new_total:>12.2f}{sum(cold.values()) * 1000:>12.2f}"
+              f"{old_total / new_total:>9.1f}x")
+
+        if diff.mean() > MAX_MEAN_DIFF or diff.max() > MAX_PIXEL_DIFF:
+            print("❌ Output differs from the legacy pipeline beyond tolerance")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Outputs match the legacy pipeline within tolerance")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Compare peak memory of the JSON/base64 and binary travel-photo payload paths.
+
+Runs the app's own request parsing (_read_travel_photo_request) and response
+building (_image_response) for a JSON body with a base64 data URI, a
+multipart upload and a raw image body, and reports the peak traced
+allocation per request for several photo sizes. No network access needed.
+
+Usage: python bench_photo_payloads.py
+"""
+
+import base64
+import io
+import json
+import os
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+for name in ("REPLICATE_API_TOKEN", "SERPAPI_API_KEY", "GEMINI_API_KEY"):
+    os.environ.setdefault(name, "bench")
+os.environ.setdefault("REMBG_PRELOAD", "0")
+os.environ.setdefault("BACKGROUND_PRELOAD", "0")
+
+import app as backend  # noqa: E402
+
+SIZES = [(1080, 1440), (3024, 4032)]
+
+
+def photo_bytes(width, height):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, mode="RGB").save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def handle(image, binary, **request_kwargs):
+    """Parse the request and build the response the way the photo route does."""
+    with backend.app.test_request_context("/generate-travel-photo", method="POST", **request_kwargs):
+        _, user_image, _ = backend._read_travel_photo_request()
+        response = backend._image_response(image, "image/jpeg", binary)
+        if isinstance(response, tuple):
+            response = response[0]
+        return len(user_image), len(response.get_data())
+
+
+def peak(fn, *args, **kwargs):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn(*args, **kwargs)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_bytes
+
+
+def main():
+    print(f"{'photo':<14}{'upload KB':>12}{'json KB':>12}{'multipart KB':>15}{'raw KB':>10}{'saved':>9}")
+    for width, height in SIZES:
+        image = photo_bytes(width, height)
+        json_body = json.dumps({
+            "userImage": "data:image/jpeg;base64," + base64.b64encode(image).decode("ascii"),
+            "landmarkId": "eiffel-tower",
+        })
+
+        json_peak = peak(handle, image, False, data=json_body, content_type="application/json")
+        multipart_peak = peak(handle, image, True, content_type="multipart/form-data",
+                              data={"userImage": (io.BytesIO(image), "me.jpg"), "landmarkId": "eiffel-tower"})
+        raw_peak = peak(handle, image, True, data=image, content_type="image/jpeg",
+                        query_string={"landmarkId": "eiffel-tower"})
+        saved = 1 - max(multipart_peak, raw_peak) / json_peak
+        print(f"{f'{width}x{height}':<14}{len(image) / 1024:>12.0f}{json_peak / 1024:>12.0f}"
+              f"{multipart_peak / 1024:>15.0f}{raw_peak / 1024:>10.0f}{saved:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
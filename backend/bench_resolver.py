@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Benchmark the destination resolver on large synthetic name sets.
+
+Builds a FuzzyIndex over N generated place names (default 100k), then
+prints build time, memory and latency percentiles for exact lookups,
+fuzzy lookups (one typo) and prefix completion, plus the resolver over the
+real dataset with its result cache.
+
+Usage: python bench_resolver.py [names]
+"""
+
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from resolver import RESOLVER, FuzzyIndex, normalize
+
+ONSETS = ["", "b", "c", "d", "f", "g", "h", "j", "k", "l", "m", "n", "p", "r", "s", "t", "v", "w", "z",
+          "br", "ch", "cr", "dr", "fl", "gr", "kr", "pl", "sh", "st", "th", "tr", "vl", "zh"]
+VOWELS = ["a", "e", "i", "o", "u", "ai", "ou", "y", "ei", "ia"]
+CODAS = ["", "", "", "n", "r", "s", "l", "m", "t", "k", "nd", "rg", "st"]
+SUFFIXES = ["", "", "", " city", " beach", " heights", " springs", " harbour", " valley"]
+QUERIES = 2000
+
+
+def place_names(count, seed=7):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        name = "".join(rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+                       for _ in range(rng.randint(2, 3)))
+        names.add(name.capitalize() + rng.choice(SUFFIXES))
+    return sorted(names)
+
+
+def typo(name, rng):
+    i = rng.randrange(1, len(name))
+    edit = rng.choice(("drop", "swap", "double"))
+    if edit == "drop":
+        return name[:i] + name[i + 1:]
+    if edit == "swap" and i < len(name) - 1:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + name[i] + name[i:]
+
+
+def percentiles(samples_us):
+    samples_us = sorted(samples_us)
+
+    def pick(q):
+        return samples_us[min(len(samples_us) - 1, int(q * len(samples_us)))]
+
+    return (f"p50 {pick(0.5):7.1f}µs  p95 {pick(0.95):7.1f}µs  p99 {pick(0.99):7.1f}µs  "
+            f"mean {statistics.fmean(samples_us):7.1f}µs")
+
+
+def timed(fn, queries):
+    samples = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(query))
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(11)
+    names = place_names(count)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = FuzzyIndex()
+    for i, name in enumerate(names):
+        index.add(name, i)
+    build_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Index of {len(index):,} names: built in {build_seconds:.2f}s, peak {peak / 2**20:.0f} MiB")
+
+    sample = rng.sample(names, QUERIES)
+    samples, _ = timed(index.exact, [name.upper() for name in sample])
+    print(f"  exact       {percentiles(samples)}")
+
+    typos = [typo(name, rng) for name in sample]
+    samples, results = timed(lambda query: index.search(query, limit=1), typos)
+    found = sum(1 for name, result in zip(sample, results) if result and result[0][1] == normalize(name))
+    print(f"  fuzzy       {percentiles(samples)}  ({found / QUERIES:.1%} found the original)")
+
+    samples, results = timed(lambda query: index.complete(query, limit=10), [name[:4] for name in sample])
+    print(f"  complete    {percentiles(samples)}")
+
+    queries = ["paris", "Paris, France", "Tokyo Japan", "barcelonna", "NYC", "CDG", "Reykjavík", "Atlantis",
+               "Bern", "York"]
+    RESOLVER.resolve("warm-up")
+    samples, results = timed(RESOLVER.resolve, queries)
+    print(f"\nResolver ({len(RESOLVER.destinations)} destinations), first lookup: {percentiles(samples)}")
+    for query, record in zip(queries, results):
+        print(f"  {query!r:18} -> {record.name if record else None}")
+    samples, _ = timed(RESOLVER.resolve, queries * 250)
+    print(f"  cached      {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
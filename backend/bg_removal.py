@@ -0,0 +1,195 @@
+"""Managed rembg sessions for the compositing path.
+
+Each worker keeps one explicitly configured onnxruntime session instead of
+letting ``rembg.remove`` set one up implicitly on the first request. The
+model and thread counts are configurable, and ``start_warmup`` loads the
+model in the background behind a readiness flag.
+
+``BatchingRemover`` collects concurrent removal requests for a short window
+and runs them through the model as one batch.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Models in the u2net family share the same preprocessing and can be batched
+BATCHABLE_MODELS = {"u2net", "u2netp", "u2net_human_seg", "silueta"}
+U2NET_MEAN = (0.485, 0.456, 0.406)
+U2NET_STD = (0.229, 0.224, 0.225)
+U2NET_SIZE = (320, 320)
+
+
+class BackgroundRemover:
+    def __init__(self, model_name="u2net", intra_op_threads=0, inter_op_threads=0):
+        self.model_name = model_name
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.ready = False
+        self.error = None
+        self.load_seconds = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        import onnxruntime as ort
+        from rembg.sessions import sessions_class
+
+        sess_opts = ort.SessionOptions()
+        if self.intra_op_threads:
+            sess_opts.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            sess_opts.inter_op_num_threads = self.inter_op_threads
+
+        for session_class in sessions_class:
+            if session_class.name() == self.model_name:
+                return session_class(self.model_name, sess_opts)
+        raise ValueError(f"Unknown rembg model: {self.model_name}")
+
+    def session(self):
+        """Return this worker's session, loading the model on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    started = time.time()
+                    try:
+                        self._session = self._create_session()
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.load_seconds = round(time.time() - started, 3)
+                    print(f"Loaded rembg model {self.model_name} in {self.load_seconds}s")
+        return self._session
+
+    def remove(self, image):
+        from rembg import remove
+
+        return remove(image, session=self.session())
+
+    def warmup(self):
+        """Load the model and run one tiny inference so the first request is warm."""
+        try:
+            self.remove(Image.new("RGB", (64, 64), (128, 128, 128)))
+        except Exception as e:
+            self.error = str(e)
+            print(f"Background removal warmup failed: {e}")
+            return False
+        self.ready = True
+        self.error = None
+        return True
+
+    def start_warmup(self):
+        thread = threading.Thread(target=self.warmup, name="rembg-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "model": self.model_name,
+            "intraOpThreads": self.intra_op_threads,
+            "loadSeconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+class BatchingRemover:
+    def __init__(self, remover, max_batch=4, window=0.02):
+        self.remover = remover
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.images = 0
+        self.largest_batch = 0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="rembg-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, image):
+        """Queue one image and return a Future for its RGBA cutout."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def remove(self, image):
+        return self.submit(image).result()
+
+    def remove_many(self, images):
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            images = [image for image, _ in batch]
+            try:
+                results = self._run_batch(images)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            with self._lock:
+                self.batches += 1
+                self.images += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def _run_batch(self, images):
+        if len(images) == 1 or self.remover.model_name not in BATCHABLE_MODELS:
+            return [self.remover.remove(image) for image in images]
+
+        session = self.remover.session()
+        images = [ImageOps.exif_transpose(image).convert("RGB") for image in images]
+        feeds = [session.normalize(image, U2NET_MEAN, U2NET_STD, U2NET_SIZE) for image in images]
+        input_name = next(iter(feeds[0]))
+        try:
+            preds = session.inner_session.run(
+                None, {input_name: np.concatenate([feed[input_name] for feed in feeds], axis=0)}
+            )[0][:, 0, :, :]
+        except Exception:
+            # Model was exported with a fixed batch size of 1
+            preds = np.concatenate([session.inner_session.run(None, feed)[0][:, 0, :, :] for feed in feeds])
+
+        results = []
+        for image, pred in zip(images, preds):
+            # Same mask post-processing and cutout as rembg.remove
+            ma, mi = np.max(pred), np.min(pred)
+            pred = (pred - mi) / (ma - mi) if ma > mi else np.zeros_like(pred)
+            mask = Image.fromarray((pred * 255).astype("uint8"), mode="L").resize(image.size, Image.LANCZOS)
+            cutout = Image.composite(image.convert("RGBA"), Image.new("RGBA", image.size, 0), mask)
+            results.append(cutout)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "images": self.images,
+                "avgBatchSize": round(self.images / self.batches, 2) if self.batches else 0.0,
+                "largestBatch": self.largest_batch,
+                "pending": self._queue.qsize(),
+            }
@@ -0,0 +1,335 @@
+"""Bounded caches for expensive backend results.
+
+``TieredCache`` puts a small LRU/TTL tier in process memory in front of an
+optional shared tier (``SQLiteCache`` on local disk) that every gunicorn
+worker reads, so adding workers doesn't lower the hit rate.
+
+Any object with ``get_entry(key)``, ``set(key, value, ttl)``, ``delete(key)``
+and ``stats()`` can stand in for the shared tier.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _value_size(value):
+    """Approximate the memory cost of a cached value by its JSON size."""
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with a per-entry TTL and a total size limit in bytes."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=10000, ttl=3600):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_entry(self, key):
+        """Return ``(value, expires_at)`` for a live entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.time():
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, expires_at
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def expiry(self, key):
+        """When a live entry expires, or None; not counted as a hit or miss and
+        doesn't refresh the entry's recency."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl=None, expires_at=None, size=None):
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        if size is None:
+            size = _value_size(value)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            if self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._shrink()
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove(key, entry[2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key, size):
+        del self._entries[key]
+        self._bytes -= size
+
+    def _shrink(self):
+        # Drop anything already expired before evicting live entries
+        now = time.time()
+        for key, (_, expires_at, size) in list(self._entries.items()):
+            if expires_at <= now:
+                self._remove(key, size)
+                self.expirations += 1
+
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+            }
+
+
+class SQLiteCache:
+    """TTL cache stored in a local SQLite file shared by all worker processes.
+
+    Values are stored as JSON. When the table grows past ``max_bytes`` the
+    least recently read rows are deleted.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=3600, namespace="default"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.namespace = namespace
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (namespace, accessed_at)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_entry(self, key):
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+        except sqlite3.Error as e:
+            print(f"Shared cache read failed: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def expiry(self, key):
+        """When a live entry expires, or None; leaves stats and access times alone."""
+        try:
+            row = self._connect().execute(
+                "SELECT expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Shared cache read failed: {e}")
+            return None
+        if row is None or row[0] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (self.ttl if ttl is None else ttl)
+        payload = json.dumps(value, separators=(",", ":"), default=str)
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, expires_at, now, len(payload)),
+            )
+            self._shrink(conn, now)
+        except sqlite3.Error as e:
+            print(f"Shared cache write failed: {e}")
+            return False
+        return True
+
+    def delete(self, key):
+        try:
+            self._connect().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+        except sqlite3.Error as e:
+            print(f"Shared cache delete failed: {e}")
+
+    def _shrink(self, conn, now):
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute(
+                "SELECT key, size FROM cache WHERE namespace = ? ORDER BY accessed_at LIMIT 1",
+                (self.namespace,),
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, row[0]))
+            total -= row[1]
+            self.evictions += 1
+
+    def stats(self):
+        try:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "maxBytes": self.max_bytes,
+            "path": self.path,
+        }
+
+
+class TieredCache:
+    """In-process memory tier backed by an optional shared tier."""
+
+    def __init__(self, memory, shared=None):
+        self.memory = memory
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key):
+        entry = self.memory.get_entry(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get_entry(key)
+            if entry is not None:
+                # Promote into this worker's memory tier with the remaining TTL
+                self.memory.set(key, entry[0], expires_at=entry[1])
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def expiry(self, key):
+        """When a live entry expires in either tier, or None; nothing is counted
+        or promoted."""
+        expires_at = self.memory.expiry(key)
+        if expires_at is None and self.shared is not None:
+            expires_at = self.shared.expiry(key)
+        return expires_at
+
+    def set(self, key, value, ttl=None):
+        ttl = self.memory.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl
+        self.memory.set(key, value, expires_at=expires_at)
+        if self.shared is not None:
+            self.shared.set(key, value, expires_at=expires_at)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def __contains__(self, key):
+        return key in self.memory
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.memory.evictions + (self.shared.stats()["evictions"] if self.shared else 0),
+            "memory": self.memory.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
@@ -0,0 +1,153 @@
+"""Circuit breakers for outbound dependencies.
+
+Each upstream (SerpAPI, Gemini, Replicate, image hosts) gets a
+``CircuitBreaker`` that watches its recent calls. The circuit is:
+
+- closed: calls go through; outcomes are kept for ``window`` seconds
+- open: once at least ``min_calls`` recent calls were mostly errors
+  (``error_rate``) or mostly slower than ``slow_seconds`` (``slow_rate``),
+  calls fail immediately with ``CircuitOpen`` for ``open_seconds``, so
+  callers go straight to their fallback instead of waiting on a dead host
+- half-open: after ``open_seconds`` one trial call is let through; success
+  closes the circuit, failure opens it again
+
+``observer(name, seconds, error)``, if given, is called with every recorded
+outcome (used for the upstream latency metrics).
+
+    with breaker.guard():
+        response = call_upstream()
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, window=60, min_calls=5, error_rate=0.5, slow_seconds=None, slow_rate=0.8,
+                 open_seconds=30, observer=None):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.observer = observer
+        self._lock = threading.Lock()
+        self._calls = deque()  # (finished_at, error, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.rejected = 0
+        self.opened = 0
+        self.last_error = None
+
+    def _prune(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+            retry_after = max(0.0, self.open_seconds - (now - self._opened_at)) if state == OPEN else 1.0
+        raise CircuitOpen(self.name, retry_after)
+
+    def record(self, seconds, error=None):
+        """Record the outcome of a call that ``allow`` let through."""
+        now = time.monotonic()
+        slow = self.slow_seconds is not None and seconds > self.slow_seconds
+        if self.observer is not None:
+            self.observer(self.name, seconds, error)
+        with self._lock:
+            if error is not None:
+                self.last_error = str(error)[:200]
+            if self._state == HALF_OPEN:
+                self._trial_running = False
+                if error is None and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            self._calls.append((now, error is not None, slow))
+            self._prune(now)
+            if self._state == CLOSED and self._should_open():
+                self._open(now)
+
+    def _should_open(self):
+        calls = len(self._calls)
+        if calls < self.min_calls:
+            return False
+        errors = sum(1 for _, error, _ in self._calls if error)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return errors / calls >= self.error_rate or slow / calls >= self.slow_rate
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self.opened += 1
+        print(f"Circuit {self.name} opened for {self.open_seconds}s")
+
+    @contextmanager
+    def guard(self):
+        """Fail fast while open; otherwise time the wrapped call and record its outcome."""
+        self.allow()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            # Record anything raised, or a half-open circuit would keep its trial slot forever
+            self.record(time.monotonic() - started, error=e)
+            raise
+        self.record(time.monotonic() - started)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            self._prune(now)
+            calls = len(self._calls)
+            errors = sum(1 for _, error, _ in self._calls if error)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            return {
+                "state": state,
+                "recentCalls": calls,
+                "errorRate": round(errors / calls, 3) if calls else 0.0,
+                "slowRate": round(slow / calls, 3) if calls else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retryAfter": round(max(0.0, self.open_seconds - (now - self._opened_at)), 1) if state == OPEN else None,
+                "lastError": self.last_error,
+            }
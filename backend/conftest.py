@@ -0,0 +1,29 @@
+"""Shared pytest setup: tests that need the Flask app import it through the ``backend`` fixture.
+
+``app`` reads its configuration at import time, so dummy API keys are set
+and the background preloads are switched off before any test imports it.
+Keys from .env are loaded first so the live API scripts still get them.
+"""
+
+import importlib
+import os
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv()
+for name in ("REPLICATE_API_TOKEN", "SERPAPI_API_KEY", "GEMINI_API_KEY"):
+    os.environ.setdefault(name, "test")
+for name in ("REMBG_PRELOAD", "BACKGROUND_PRELOAD", "LAZY_PRELOAD", "PREWARM_ENABLED"):
+    os.environ.setdefault(name, "0")
+
+
+@pytest.fixture(scope="session")
+def backend():
+    """The imported ``app`` module."""
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
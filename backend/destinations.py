@@ -0,0 +1,112 @@
+"""Destination reference data for the fallback and estimate paths.
+
+Typical flight prices, hotel rates, climate, event context and the main
+airport's IATA code per destination, built once at import from
+``destinations.json`` (next to this module). ``DESTINATIONS.load(path)``
+adds or overrides records from another file in the same format, so larger
+datasets can ship as data.
+
+Records are slotted objects holding tuples; the index maps case-folded
+names and aliases to records, so lookups are a single dict access.
+Unknown destinations get the dataset's defaults.
+
+    record = DESTINATIONS.lookup("paris")
+    record.name, record.flight_price, record.hotel.standard, record.climate.temp_max
+"""
+
+import json
+import os
+from collections import namedtuple
+
+DEFAULT_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "destinations.json")
+
+HotelRates = namedtuple("HotelRates", "budget standard luxury")
+Climate = namedtuple("Climate", "temp_min temp_max conditions")
+EventContext = namedtuple("EventContext", "culture venues sport")
+
+
+def _key(name):
+    return " ".join(str(name or "").split()).casefold()
+
+
+class Destination:
+    __slots__ = ("name", "aliases", "iata", "flight_price", "hotel", "climate", "events", "known")
+
+    def __init__(self, name, aliases, iata, flight_price, hotel, climate, events, known=True):
+        self.name = name
+        self.aliases = aliases
+        self.iata = iata
+        self.flight_price = flight_price
+        self.hotel = hotel
+        self.climate = climate
+        self.events = events
+        self.known = known
+
+    def __repr__(self):
+        return f"Destination({self.name!r})"
+
+
+class DestinationIndex:
+    def __init__(self):
+        self._by_key = {}
+        self._records = {}  # canonical key -> record, in load order
+        self.defaults = None
+        self.version = 0  # bumped on every change, so derived indexes know to rebuild
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def load(self, path):
+        """Add the destinations in the JSON file at ``path``; later records replace earlier ones."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if "defaults" in data:
+            self.defaults = _record(dict(data["defaults"], name=""), None, known=False)
+        for entry in data.get("destinations", []):
+            self.add(_record(entry, self.defaults))
+        return self
+
+    def add(self, record):
+        self._records[_key(record.name)] = record
+        self._by_key[_key(record.name)] = record
+        for alias in record.aliases:
+            self._by_key[_key(alias)] = record
+        self.version += 1
+
+    def get(self, name):
+        """The record for ``name`` or one of its aliases (any case/spacing), or None."""
+        return self._by_key.get(_key(name))
+
+    def lookup(self, name):
+        """The record for ``name``, or the defaults under that name if it is unknown."""
+        record = self._by_key.get(_key(name))
+        if record is not None:
+            return record
+        defaults = self.defaults
+        return Destination(name, (), None, defaults.flight_price, defaults.hotel, defaults.climate, defaults.events,
+                           known=False)
+
+    def names(self):
+        return [record.name for record in self._records.values()]
+
+
+def _record(entry, defaults, known=True):
+    climate = entry.get("climate")
+    events = entry.get("events")
+    hotel = entry.get("hotel")
+    return Destination(
+        entry["name"],
+        tuple(entry.get("aliases", ())),
+        entry.get("iata"),
+        entry.get("flight", defaults.flight_price if defaults else None),
+        HotelRates(*hotel) if hotel else defaults.hotel,
+        Climate(climate["temp"][0], climate["temp"][1], tuple(climate["conditions"])) if climate else defaults.climate,
+        EventContext(events["culture"], tuple(events["venues"]), events["sport"]) if events else defaults.events,
+        known=known,
+    )
+
+
+DESTINATIONS = DestinationIndex().load(DEFAULT_DATA_FILE)
@@ -0,0 +1,234 @@
+"""Shared outbound HTTP client.
+
+One pooled ``requests.Session`` per host replaces bare ``requests.get``
+calls, so connections and TLS sessions are reused across requests. Each
+upstream is registered with its own connect/read timeouts and retry budget;
+idempotent calls that hit a connection error, a timeout or a retryable
+status are retried with full-jitter exponential backoff. Latency and error
+counts are kept per host for the stats endpoint. An upstream registered
+with a ``breaker`` fails fast with ``CircuitOpen`` while its circuit is open;
+one registered with a ``breaker_factory`` gets a breaker per host instead
+(the ``max_breakers`` most recently used), so one dead host can't open the
+circuit for every other host behind the same upstream.
+
+Image URLs can point at any host, so at most ``max_sessions`` sessions are
+kept; the least recently used one is closed when a new host needs a slot.
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Upstream:
+    def __init__(self, name, connect_timeout=3.05, read_timeout=10, retries=2, backoff=0.25, max_backoff=2.0,
+                 breaker=None, breaker_factory=None, max_breakers=32):
+        self.name = name
+        self.breaker = breaker
+        self.breaker_factory = breaker_factory
+        self.max_breakers = max_breakers
+        self._breakers = OrderedDict()  # host -> CircuitBreaker, least recently used first
+        self._lock = threading.Lock()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def delay(self, attempt, retry_after=None):
+        """Full-jitter backoff for retry number ``attempt`` (0-based)."""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def breaker_for(self, host):
+        """The circuit breaker guarding calls to ``host``, or None."""
+        if self.breaker_factory is None:
+            return self.breaker
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is not None:
+                self._breakers.move_to_end(host)
+                return breaker
+            breaker = self._breakers[host] = self.breaker_factory(host)
+            if len(self._breakers) > self.max_breakers:
+                self._breakers.popitem(last=False)
+        return breaker
+
+    def breakers(self):
+        """{host: breaker} for an upstream with a breaker per host."""
+        with self._lock:
+            return dict(self._breakers)
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds, error):
+        self.requests += 1
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avgMs": round(self.total_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            "maxMs": round(self.max_seconds * 1000, 1),
+        }
+
+
+class HttpClient:
+    def __init__(self, pool_size=10, default=None, user_agent=None, max_sessions=32):
+        self.pool_size = pool_size
+        self.max_sessions = max_sessions
+        self.default = default or Upstream("default")
+        self.user_agent = user_agent
+        self._upstreams = {}
+        self._sessions = OrderedDict()  # host -> Session, least recently used first
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, **options):
+        """Configure timeouts/retries for calls made with ``upstream=name``."""
+        upstream = Upstream(name, **options)
+        self._upstreams[name] = upstream
+        return upstream
+
+    def upstream(self, name):
+        return self._upstreams.get(name, self.default) if name else self.default
+
+    def session(self, host):
+        evicted = None
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is not None:
+                self._sessions.move_to_end(host)
+            else:
+                session = requests.Session()
+                # Retries are handled in request() so they can be jittered and counted
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if self.user_agent:
+                    session.headers["User-Agent"] = self.user_agent
+                self._sessions[host] = session
+                if len(self._sessions) > self.max_sessions:
+                    _, evicted = self._sessions.popitem(last=False)
+        if evicted is not None:
+            # A request still running on it finishes; its connection just isn't pooled
+            evicted.close()
+        return session
+
+    def _host_stats(self, host):
+        with self._lock:
+            stats = self._stats.get(host)
+            if stats is None:
+                stats = self._stats[host] = HostStats()
+        return stats
+
+    @contextmanager
+    def track(self, host):
+        """Record latency/errors for a call made through another client (e.g. an SDK)."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._record(host, time.perf_counter() - started, error=True)
+            raise
+        self._record(host, time.perf_counter() - started, error=False)
+
+    def _record(self, host, seconds, error):
+        stats = self._host_stats(host)
+        with self._lock:
+            stats.record(seconds, error)
+
+    def request(self, method, url, upstream=None, timeout=None, retries=None, **kwargs):
+        """Send a request through the pooled session for the URL's host.
+
+        ``upstream`` names a registered upstream whose timeouts and retry
+        budget apply. Only GET/HEAD are retried by default; pass ``retries``
+        to override. Returns the ``requests.Response`` of the last attempt, or
+        raises the last ``requests.RequestException`` (or ``CircuitOpen``).
+        """
+        config = self.upstream(upstream)
+        if retries is None:
+            retries = config.retries if method.upper() in ("GET", "HEAD") else 0
+        breaker = config.breaker_for(urlsplit(url).netloc)
+        if breaker is None:
+            return self._send(method, url, config, timeout, retries, kwargs)
+
+        # The breaker sees one outcome per call, after retries. Anything raised
+        # is recorded, so a half-open circuit always gets its trial back.
+        breaker.allow()
+        started = time.perf_counter()
+        try:
+            response = self._send(method, url, config, timeout, retries, kwargs)
+        except BaseException as e:
+            breaker.record(time.perf_counter() - started, error=e)
+            raise
+        failed = response.status_code >= 500 or response.status_code == 429
+        breaker.record(time.perf_counter() - started, error=f"HTTP {response.status_code}" if failed else None)
+        return response
+
+    def _send(self, method, url, config, timeout, retries, kwargs):
+        host = urlsplit(url).netloc
+        session = self.session(host)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, timeout=timeout or config.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, time.perf_counter() - started, error=True)
+                if attempt >= retries:
+                    raise
+                print(f"HTTP {method} {host} failed ({e.__class__.__name__}), retrying")
+                delay = config.delay(attempt)
+            else:
+                failed = response.status_code >= 500 or response.status_code == 429
+                self._record(host, time.perf_counter() - started, error=failed)
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                print(f"HTTP {method} {host} returned {response.status_code}, retrying")
+                delay = config.delay(attempt, _retry_after(response))
+                response.close()
+
+            with self._lock:
+                self._stats[host].retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {host: stats.to_dict() for host, stats in self._stats.items()}
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,99 @@
+"""Normalized itinerary cache keys and near-hit reuse.
+
+Requests that only differ cosmetically share one cache entry:
+
+- destinations are resolved through the shared destination resolver
+  ("paris ", "Paris, France" and "Pariss" are the same trip, "NYC" is
+  "New York")
+- budgets fall into log-spaced bands (2000 and 2050 are the same band)
+- interests are stripped, case-folded, de-duplicated and sorted
+
+A cached itinerary generated for a different budget (same band, or a
+neighbouring band on a near miss) is served with its money figures rescaled
+to the requested budget by ``rescale_itinerary``.
+"""
+
+import copy
+import math
+
+from resolver import RESOLVER
+
+# Lower edges of the budget bands, in USD
+BUDGET_BANDS = (0, 500, 750, 1000, 1250, 1500, 1750, 2000, 2500, 3000, 3500, 4000, 5000, 6000,
+                7500, 10000, 12500, 15000, 20000, 30000, 50000)
+
+
+def canonical_destination(name):
+    """Canonical display name for a destination as typed by a user."""
+    return RESOLVER.canonical(name)
+
+
+def budget_band(budget):
+    """Index of the band ``budget`` falls into."""
+    index = 0
+    for i, edge in enumerate(BUDGET_BANDS):
+        if budget >= edge:
+            index = i
+    return index
+
+
+def neighbour_bands(band):
+    """Bands to try, nearest first, when ``band`` misses."""
+    return [b for b in (band - 1, band + 1) if 0 <= b < len(BUDGET_BANDS)]
+
+
+def normalize_interests(interests):
+    if isinstance(interests, str):
+        interests = interests.split(",")
+    return sorted({" ".join(str(i).split()).casefold() for i in interests or [] if str(i).strip()})
+
+
+def itinerary_key(destination, origin, days, band, interests):
+    interests_key = ",".join(interests) if interests else "general"
+    return f"{destination.casefold()}_{origin.casefold()}_{days}_b{band}_{interests_key}"
+
+
+def _scale(value, factor):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    return int(round(value * factor))
+
+
+def rescale_itinerary(itinerary, from_budget, to_budget):
+    """Copy of ``itinerary`` with totals and the cost breakdown scaled to ``to_budget``.
+
+    Only aggregate money fields are scaled; per-activity costs and live
+    prices (``realPricing``) are left as generated.
+    """
+    if not from_budget or from_budget == to_budget:
+        return itinerary
+    factor = to_budget / from_budget
+    scaled = copy.deepcopy(itinerary)
+    scaled["totalBudget"] = to_budget
+
+    breakdown = scaled.get("costBreakdown")
+    if isinstance(breakdown, dict):
+        scaled["costBreakdown"] = {key: _scale(value, factor) for key, value in breakdown.items()}
+
+    summary = scaled.get("budgetSummary")
+    if isinstance(summary, dict):
+        for key in ("totalEstimated", "remaining"):
+            if key in summary:
+                summary[key] = _scale(summary[key], factor)
+
+    for day in scaled.get("dailyItinerary") or []:
+        if isinstance(day, dict) and "estimatedDailyCost" in day:
+            day["estimatedDailyCost"] = _scale(day["estimatedDailyCost"], factor)
+
+    scaled["generatedForBudget"] = from_budget
+    return scaled
+
+
+def parse_budget(value, default=2000):
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        return default
+    if not math.isfinite(budget) or budget <= 0:
+        return default
+    return int(budget) if budget.is_integer() else budget
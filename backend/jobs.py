@@ -0,0 +1,158 @@
+"""Background job runner for slow, long-running requests.
+
+Jobs run on a bounded thread pool so slow work (SDXL, compositing) doesn't
+hold request threads. Callers poll ``JobManager.get`` or block on
+``Job.wait_for_change`` to stream progress. Jobs live in this worker's
+memory, so clients must poll the same instance that accepted the job.
+
+Finished jobs (and their output bytes) are dropped ``ttl`` seconds after
+they finish: on any lookup, and by a sweeper thread every
+``sweep_interval`` seconds so an idle worker frees them too.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.artifact = None  # binary output (e.g. image bytes), served separately from to_dict()
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def update(self, stage=None, progress=None, status=None, result=None, error=None):
+        with self._cond:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = progress
+            if status is not None:
+                self.status = status
+            if result is not None:
+                self.result = result
+            if error is not None:
+                self.error = error
+            self.updated_at = time.time()
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """Block until the job changes past ``version`` or ``timeout`` expires."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def to_dict(self, include_result=True):
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    def __init__(self, max_workers=2, max_pending=16, ttl=900, name="jobs", sweep_interval=60):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.name = name
+        self._sweeper = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, fn):
+        """Queue ``fn(job)`` and return its Job; raises JobQueueFull when at capacity.
+
+        ``fn`` reports progress with ``job.update(stage=..., progress=...)`` and
+        returns the job result.
+        """
+        with self._lock:
+            self._purge_expired()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"{pending} jobs already pending")
+            job = Job()
+            self._jobs[job.id] = job
+            self.submitted += 1
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name=f"{self.name}-sweeper", daemon=True)
+                self._sweeper.start()
+
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        job.update(status="running", stage="starting")
+        try:
+            result = fn(job)
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.update(status="failed", stage="failed", error=str(e))
+            with self._lock:
+                self.failed += 1
+        else:
+            job.update(status="succeeded", stage="done", progress=100, result=result)
+            with self._lock:
+                self.succeeded += 1
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.updated_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _sweep(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            with self._lock:
+                self._purge_expired()
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            self._purge_expired()
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                "queued": statuses.count("queued"),
+                "running": statuses.count("running"),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "maxPending": self.max_pending,
+            }
@@ -0,0 +1,129 @@
+"""Incremental parser for a JSON object that arrives in chunks (e.g. a streamed LLM reply).
+
+``JSONObjectStream`` is fed text as it arrives and reports each top-level
+member of the object as soon as its value is complete. For members listed
+in ``stream_arrays``, each element of the array is reported as soon as it
+closes, before the array itself is finished. Text before the opening brace
+(such as a markdown code fence) is ignored.
+
+    stream = JSONObjectStream(stream_arrays={"dailyItinerary"})
+    for chunk in chunks:
+        for key, value, index in stream.feed(chunk):
+            ...  # index is the element number for streamed arrays, else None
+"""
+
+import json
+
+
+class JSONObjectStream:
+    def __init__(self, stream_arrays=()):
+        self.stream_arrays = set(stream_arrays)
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._start = None  # index of the top-level "{"
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"  # key -> colon -> value -> comma, at depth 1
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self._element_start = None
+        self._element_index = 0
+
+    def feed(self, text):
+        """Add ``text`` and return a list of ``(key, value, index)`` for newly completed parts."""
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+        while self._pos < len(buffer) and not self.done:
+            i = self._pos
+            char = buffer[i]
+            self._pos += 1
+
+            if self._start is None:
+                if char == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key" and self._key_start is not None:
+                        self._key = json.loads(buffer[self._key_start:i + 1])
+                        self._key_start = None
+                        self._expect = "colon"
+                continue
+
+            if char in " \t\r\n":
+                continue
+
+            if self._depth == 1:
+                if self._expect == "key":
+                    if char == '"':
+                        self._in_string = True
+                        self._key_start = i
+                    elif char == "}":
+                        self.done = True
+                    continue
+                if self._expect == "colon":
+                    if char == ":":
+                        self._expect = "value"
+                    continue
+                if self._expect == "value":
+                    self._value_start = i
+                    self._element_index = 0
+                    self._expect = "comma"
+                    if char in "{[":
+                        self._depth += 1
+                    elif char == '"':
+                        self._in_string = True
+                    continue
+                # Scalar values end at the next comma or the closing brace
+                if char in ",}":
+                    if self._value_start is not None:
+                        self._emit(events, buffer[self._value_start:i])
+                    self._expect = "key"
+                    if char == "}":
+                        self.done = True
+                continue
+
+            # Inside a top-level container value
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 2 and self._key in self.stream_arrays:
+                    self._element_start = i
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._element_start is not None:
+                    self._emit_element(events, buffer[self._element_start:i + 1])
+                    self._element_start = None
+                elif self._depth == 1:
+                    self._emit(events, buffer[self._value_start:i + 1])
+                    self._value_start = None
+        return events
+
+    def _emit(self, events, raw):
+        try:
+            events.append((self._key, json.loads(raw), None))
+        except ValueError:
+            pass  # left for the caller's full parse of the finished text
+
+    def _emit_element(self, events, raw):
+        try:
+            events.append((self._key, json.loads(raw), self._element_index))
+        except ValueError:
+            pass
+        self._element_index += 1
+
+    def text(self):
+        """The JSON object text received so far (from its opening brace)."""
+        return self.buffer[self._start:self._pos] if self._start is not None else ""
@@ -0,0 +1,94 @@
+"""Deferred imports for heavy optional subsystems.
+
+Most requests only touch the JSON endpoints, so the Gemini SDK, the
+Replicate client and reportlab are not imported when the app starts.
+``LazyModule`` is a stand-in module that imports the real one on first
+attribute access; ``LazyObject`` does the same for an object built by a
+factory (e.g. a configured client). ``preload`` imports them in a
+background thread once the server is up, so the first request that needs
+one usually finds it loaded.
+
+    genai = LazyModule("google.generativeai", on_load=lambda m: m.configure(api_key=KEY))
+    genai.GenerativeModel(...)  # imports google.generativeai here
+"""
+
+import importlib
+import threading
+import time
+
+_lock = threading.Lock()
+_load_seconds = {}  # name -> seconds spent loading
+
+
+def _timed(name, load):
+    started = time.perf_counter()
+    value = load()
+    seconds = round(time.perf_counter() - started, 3)
+    with _lock:
+        _load_seconds[name] = seconds
+    print(f"Loaded {name} in {seconds}s")
+    return value
+
+
+class LazyObject:
+    def __init__(self, name, factory):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_value", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _load(self):
+        value = self._lazy_value
+        if value is None:
+            with self._lazy_lock:
+                value = self._lazy_value
+                if value is None:
+                    value = _timed(self._lazy_name, self._lazy_factory)
+                    object.__setattr__(self, "_lazy_value", value)
+        return value
+
+    @property
+    def loaded(self):
+        return self._lazy_value is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy {self._lazy_name} ({state})>"
+
+
+class LazyModule(LazyObject):
+    def __init__(self, name, on_load=None):
+        def load():
+            module = importlib.import_module(name)
+            if on_load is not None:
+                on_load(module)
+            return module
+
+        super().__init__(name, load)
+
+
+def preload(lazy_objects, delay=0.0):
+    """Load ``lazy_objects`` one by one in a daemon thread, after ``delay`` seconds."""
+    def run():
+        time.sleep(delay)
+        for lazy in lazy_objects:
+            try:
+                lazy._load()
+            except Exception as e:
+                print(f"Preloading {lazy._lazy_name} failed: {e}")
+
+    thread = threading.Thread(target=run, name="lazy-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def stats(lazy_objects):
+    with _lock:
+        seconds = dict(_load_seconds)
+    return {
+        lazy._lazy_name: {"loaded": lazy.loaded, "loadSeconds": seconds.get(lazy._lazy_name)}
+        for lazy in lazy_objects
+    }
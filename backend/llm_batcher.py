@@ -0,0 +1,148 @@
+"""Micro-batching for small, independent LLM requests.
+
+Concurrent requests of one kind (e.g. hotel price estimates for different
+destinations) that arrive within ``window`` seconds of each other are
+collected and answered by one ``run_batch(keys)`` call, typically one
+multi-destination prompt, instead of one LLM round-trip each. Each
+caller gets its own result back.
+
+- a key is the tuple of call arguments; duplicate keys in a batch are asked
+  for once and share the result
+- a batch of one goes to ``run_one(*key)``, so quiet periods keep the
+  original single-item prompt
+- batches run on up to ``concurrency`` threads, so collecting the next
+  batch never waits for the previous LLM call
+
+``run_batch`` returns ``{key: result}``; keys it leaves out fail with
+``BatchItemMissing`` and keys mapped to an exception fail with that
+exception, without affecting the rest of the batch (the caller's tiers then
+fall back as for any error).
+
+    batcher = LLMBatcher("hotels", estimate_many, estimate_one)
+    batcher.call("Paris")  # blocks until Paris's share of the batch arrives
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class BatchItemMissing(Exception):
+    pass
+
+
+def split_results(items, keys):
+    """Map ``[{"id": i, ...}]`` reply items back to ``keys[i]``; ids out of range are dropped."""
+    results = {}
+    for item in items:
+        item = dict(item)
+        i = item.pop("id", None)
+        if isinstance(i, int) and 0 <= i < len(keys) and keys[i] not in results:
+            results[keys[i]] = item
+    return results
+
+
+class LLMBatcher:
+    def __init__(self, name, run_batch, run_one, max_batch=10, window=0.1, concurrency=4):
+        self.name = name
+        self.run_batch = run_batch
+        self.run_one = run_one
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"llm-batch-{name}")
+        self._thread = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.llm_calls = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_batch > 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=f"llm-batcher-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def submit(self, *key):
+        """Queue one request and return a Future for its result."""
+        future = Future()
+        if not self.enabled:
+            with self._lock:
+                self.requests += 1
+            self._pool.submit(self._run, {key: [future]})
+            return future
+        self._ensure_thread()
+        self._queue.put((key, future))
+        return future
+
+    def call(self, *key):
+        return self.submit(*key).result()
+
+    def _loop(self):
+        while True:
+            key, future = self._queue.get()
+            waiting = {key: [future]}  # distinct key -> futures, in arrival order
+            deadline = time.monotonic() + self.window
+            while len(waiting) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    key, future = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                waiting.setdefault(key, []).append(future)
+
+            with self._lock:
+                self.requests += sum(len(futures) for futures in waiting.values())
+            self._pool.submit(self._run, waiting)
+
+    def _run(self, waiting):
+        keys = list(waiting)
+        try:
+            if len(keys) == 1:
+                results = {keys[0]: self.run_one(*keys[0])}
+            else:
+                results = self.run_batch(keys)
+        except Exception as e:
+            with self._lock:
+                self.llm_calls += 1
+                self.errors += 1
+            for futures in waiting.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self.llm_calls += 1
+            if len(keys) > 1:
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(keys))
+        for key, futures in waiting.items():
+            for future in futures:
+                if key not in results:
+                    future.set_exception(BatchItemMissing(f"{self.name} batch reply had no result for {key!r}"))
+                elif isinstance(results[key], BaseException):
+                    future.set_exception(results[key])
+                else:
+                    future.set_result(results[key])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "requests": self.requests,
+                "llmCalls": self.llm_calls,
+                "batches": self.batches,
+                "largestBatch": self.largest_batch,
+                "errors": self.errors,
+                "callsSaved": self.requests - self.llm_calls,
+            }
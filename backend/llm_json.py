@@ -0,0 +1,167 @@
+"""Extract JSON from LLM replies.
+
+``extract_json`` finds the JSON object (or array) in a reply with one scan
+that tracks strings and nesting, so markdown fences, prose before or after
+the JSON and braces inside string values don't confuse it. The same scan
+builds a repaired copy of the text, used only if the raw text doesn't
+parse. The repairs are:
+
+- trailing commas before ``}`` / ``]`` are dropped
+- raw newlines and invalid escapes inside strings are escaped
+- truncated output (e.g. ``max_output_tokens`` reached) is cut back to the
+  last complete element and the open containers are closed
+
+``json_generation_config`` turns on Gemini's JSON mode
+(``response_mime_type`` and an optional ``response_schema``), which makes
+most of this unnecessary; the scan stays as the safety net.
+"""
+
+import json
+import threading
+
+VALID_ESCAPES = set('"\\/bfnrtu')
+CLOSERS = {"{": "}", "[": "]"}
+
+_stats_lock = threading.Lock()
+_stats = {"parsed": 0, "repaired": 0, "failed": 0}
+
+
+class LLMJSONError(ValueError):
+    pass
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def json_generation_config(generation_config=None, schema=None):
+    """Gemini generation config asking for a JSON reply (optionally matching ``schema``)."""
+    config = dict(generation_config or {})
+    config["response_mime_type"] = "application/json"
+    if schema is not None:
+        config["response_schema"] = schema
+    return config
+
+
+def _scan(text, start):
+    """Scan one JSON value starting at ``text[start]``.
+
+    Returns ``(end, repaired)``: ``end`` is the index just past the balanced
+    value, or None if the text ended first; ``repaired`` is the repaired
+    (and, if truncated, closed) copy of the value. Both are None when the
+    brackets don't match, i.e. this isn't the JSON we are looking for.
+    """
+    out = []
+    stack = []  # [opener, cut] per open container; cut = len(out) after its last complete element
+    in_string = False
+    escape = False
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                if char not in VALID_ESCAPES:
+                    out.append("\\")  # the backslash itself was meant literally
+                out.append(char)
+            elif char == "\\":
+                escape = True
+                out.append(char)
+            elif char == '"':
+                in_string = False
+                out.append(char)
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in CLOSERS:
+            out.append(char)
+            stack.append([char, len(out)])
+        elif char in "}]":
+            if not stack or CLOSERS[stack[-1][0]] != char:
+                return None, None
+            # Drop a trailing comma before the closer
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(char)
+            stack.pop()
+            if not stack:
+                return i + 1, "".join(out)
+        elif char == ",":
+            stack[-1][1] = len(out)
+            out.append(char)
+        else:
+            out.append(char)
+
+    # Truncated: keep what was complete in the innermost container, close the rest
+    del out[stack[-1][1]:]
+    while stack:
+        opener, _ = stack.pop()
+        while out and out[-1] in " \t\r\n,":
+            out.pop()
+        out.append(CLOSERS[opener])
+    return None, "".join(out)
+
+
+def extract_json(text, expect=dict):
+    """Parse the first JSON value of type ``expect`` (dict or list) in ``text``.
+
+    Raises LLMJSONError if none can be parsed, even after repair.
+    """
+    if not text:
+        _count("failed")
+        raise LLMJSONError("Empty response")
+    opener = "{" if expect is dict else "["
+
+    # JSON mode replies are usually just the value: let the C parser try first
+    stripped = text.strip()
+    if stripped.startswith(opener):
+        try:
+            value = json.loads(stripped)
+            _count("parsed")
+            return value
+        except ValueError:
+            pass
+
+    start = text.find(opener)
+    while start != -1:
+        end, repaired = _scan(text, start)
+        if end is not None:
+            try:
+                value = json.loads(text[start:end])
+                _count("parsed")
+                return value
+            except ValueError:
+                pass
+        if repaired is not None:
+            try:
+                value = json.loads(repaired)
+                if isinstance(value, expect):
+                    _count("repaired")
+                    return value
+            except ValueError:
+                pass
+        if end is None and repaired is not None:
+            break  # the scan already ran to the end of the text
+        start = text.find(opener, start + 1)
+
+    _count("failed")
+    snippet = text[:200].replace("\n", " ")
+    raise LLMJSONError(f"Could not extract JSON from AI response: {snippet}")
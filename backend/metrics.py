@@ -0,0 +1,160 @@
+"""Prometheus metrics in the text exposition format.
+
+Counters and histograms are updated in place on the hot path (a lock and a
+bisect per observation). Values that other components already count, such
+as cache hits or circuit states, are read by collectors only when
+``/metrics`` is scraped.
+
+    REQUEST_SECONDS = registry.histogram("http_request_seconds", "...", ("route", "method", "status"))
+    REQUEST_SECONDS.observe(0.12, "/get-weather", "GET", "200")
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from cache hits to slow image generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, _labels(self.labelnames, labels), value) for labels, value in sorted(values.items())]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        samples = []
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", _labels(self.labelnames, labels, ("le", _number(bound))),
+                                cumulative))
+            samples.append((f"{self.name}_sum", _labels(self.labelnames, labels), values[-1]))
+            samples.append((f"{self.name}_count", _labels(self.labelnames, labels), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(self.prefix + name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self.prefix + name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name, type, help, labelnames, collect):
+        """Register a metric read at scrape time: ``collect()`` yields (label values, value)."""
+        self._collectors.append((self.prefix + name, type, help, tuple(labelnames), collect))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        for name, type, help, labelnames, collect in self._collectors:
+            try:
+                values = list(collect())
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            lines.extend(f"{name}{_labels(labelnames, labels)} {_number(value)}" for labels, value in values)
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Observe how long each stage of a pipeline took, from one ``mark`` to the next."""
+
+    def __init__(self, histogram, *labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._stage = None
+        self._started = None
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.histogram.observe(now - self._started, *self.labels, self._stage)
+        self._stage = stage
+        self._started = now
+
+    def finish(self):
+        self.mark(None)
@@ -0,0 +1,124 @@
+"""Background pre-generation of popular itineraries.
+
+``ItineraryPrewarmer`` walks a destination x days x budget x interests grid
+and generates every itinerary that is missing from the cache or will expire
+within ``refresh_margin`` seconds, so popular requests are served from the
+cache instead of reaching Gemini. Generations draw from a token bucket to
+stay within a Gemini QPS budget, separate from live traffic.
+
+Run ``python prewarm.py`` to fill the cache once from the command line
+(useful with a shared ITINERARY_CACHE_DB); the app runs the same job in a
+background thread when PREWARM_ENABLED=1.
+"""
+
+import itertools
+import threading
+import time
+
+
+def itinerary_grid(destinations, days, budgets, interest_sets, origin="New York"):
+    """Request bodies for every combination of the grid values."""
+    return [
+        {
+            "destination": destination,
+            "origin": origin,
+            "days": day_count,
+            "budget": budget,
+            "interests": list(interests),
+        }
+        for destination, day_count, budget, interests in itertools.product(destinations, days, budgets, interest_sets)
+    ]
+
+
+class ItineraryPrewarmer:
+    def __init__(self, grid, resolve, build, cache, bucket, refresh_margin=600, interval=300):
+        self.grid = grid
+        self.resolve = resolve  # request body -> (params, cache_key)
+        self.build = build  # (params, cache_key) -> itinerary, stored in cache
+        self.cache = cache
+        self.bucket = bucket
+        self.refresh_margin = refresh_margin
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.generated = 0
+        self.failed = 0
+        self.last_run_seconds = None
+        self.last_due = 0
+
+    def due(self):
+        """Grid entries that are missing or expire within ``refresh_margin``."""
+        deadline = time.time() + self.refresh_margin
+        pending = {}
+        for body in self.grid:
+            params, cache_key = self.resolve(body)
+            if cache_key in pending:
+                continue
+            # expiry() doesn't count as a hit/miss, so the sweep leaves cache stats alone
+            expires_at = self.cache.expiry(cache_key)
+            if expires_at is None or expires_at <= deadline:
+                pending[cache_key] = params
+        return [(params, cache_key) for cache_key, params in pending.items()]
+
+    def run_once(self):
+        started = time.time()
+        pending = self.due()
+        with self._lock:
+            self.last_due = len(pending)
+        print(f"Prewarm: {len(pending)} of {len(self.grid)} itineraries need generating")
+
+        for params, cache_key in pending:
+            # Background work may wait for a token instead of being rejected
+            time.sleep(self.bucket.reserve(max_wait=float("inf")))
+            try:
+                self.build(params, cache_key)
+                with self._lock:
+                    self.generated += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Prewarm of {cache_key} failed: {e}")
+
+        with self._lock:
+            self.runs += 1
+            self.last_run_seconds = round(time.time() - started, 1)
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Prewarm run failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="itinerary-prewarm", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                "gridSize": len(self.grid),
+                "running": self._thread is not None,
+                "runs": self.runs,
+                "generated": self.generated,
+                "failed": self.failed,
+                "lastDue": self.last_due,
+                "lastRunSeconds": self.last_run_seconds,
+            }
+
+
+if __name__ == "__main__":
+    import os
+
+    os.environ.setdefault("REMBG_PRELOAD", "0")
+    os.environ.setdefault("BACKGROUND_PRELOAD", "0")
+    os.environ["PREWARM_ENABLED"] = "0"  # run once here instead of in a thread
+
+    from app import itinerary_prewarmer
+
+    itinerary_prewarmer.run_once()
+    print(itinerary_prewarmer.stats())
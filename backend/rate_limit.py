@@ -0,0 +1,149 @@
+"""Token-bucket rate limiting for upstream APIs.
+
+``TokenBucket`` hands out reservations at a fixed rate. With ``state_path``
+set, the bucket state lives in a small file guarded by ``flock`` so every
+worker process on the host draws from the same bucket.
+
+``RateLimiter`` adds admission control on top: callers either get a token
+now, wait in a bounded queue for at most ``max_wait`` seconds, or are
+rejected with ``RateLimitExceeded`` carrying a Retry-After hint.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: bucket is per process only
+    fcntl = None
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1, state_path=None):
+        self.rate = float(rate)  # tokens per second
+        self.capacity = float(capacity)
+        self.state_path = state_path if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.time()
+
+    @contextmanager
+    def _state(self, now):
+        """Yield a mutable [tokens, updated] pair, shared across processes when possible."""
+        with self._lock:
+            if not self.state_path:
+                state = [self._tokens, self._updated]
+                yield state
+                self._tokens, self._updated = state
+                return
+
+            fd = os.open(self.state_path, os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.pread(fd, 64, 0).decode("ascii", "ignore").split()
+                try:
+                    state = [float(raw[0]), float(raw[1])]
+                except (IndexError, ValueError):
+                    state = [self.capacity, now]
+                yield state
+                data = f"{state[0]:.6f} {state[1]:.6f}".ljust(64).encode("ascii")
+                os.pwrite(fd, data, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def reserve(self, max_wait=0.0):
+        """Reserve one token.
+
+        Returns the number of seconds the caller must wait before using it
+        (0 when a token is free now). If that wait would exceed ``max_wait``
+        nothing is reserved and ``RateLimitExceeded`` is raised.
+        """
+        now = time.time()
+        with self._state(now) as state:
+            tokens = min(self.capacity, state[0] + max(0.0, now - state[1]) * self.rate)
+            tokens -= 1
+            wait = max(0.0, -tokens / self.rate)
+            if wait > max_wait:
+                state[0], state[1] = tokens + 1, now
+                raise RateLimitExceeded(wait)
+            state[0], state[1] = tokens, now
+        return wait
+
+    def available(self):
+        now = time.time()
+        with self._state(now) as state:
+            return min(self.capacity, state[0] + max(0.0, now - state[1]) * self.rate)
+
+
+class RateLimiter:
+    def __init__(self, bucket, max_queue=4, max_wait=0.0):
+        self.bucket = bucket
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def acquire(self, max_wait=None):
+        """Take a token, queueing for at most ``max_wait`` seconds.
+
+        Request threads use the default (``self.max_wait``, normally 0) so they
+        never sleep; background workers can pass a longer wait.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        # Claim a queue slot with the check, so concurrent callers can't all pass it
+        with self._lock:
+            queued = max_wait > 0 and self.waiting < self.max_queue
+            if queued:
+                self.waiting += 1
+            else:
+                max_wait = 0.0
+        try:
+            wait = self.bucket.reserve(max_wait)
+        except RateLimitExceeded:
+            with self._lock:
+                self.rejected += 1
+                if queued:
+                    self.waiting -= 1
+            raise
+
+        if queued:
+            try:
+                if wait > 0:
+                    with self._lock:
+                        self.max_waiting = max(self.max_waiting, self.waiting)
+                    time.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+        with self._lock:
+            self.admitted += 1
+            self.total_wait += wait
+            self.max_wait_seen = max(self.max_wait_seen, wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "queueDepth": self.waiting,
+                "maxQueueDepth": self.max_waiting,
+                "avgWaitSeconds": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+                "maxWaitSeconds": round(self.max_wait_seen, 3),
+                "tokensAvailable": round(self.bucket.available(), 3),
+            }
@@ -0,0 +1,318 @@
+"""Fuzzy destination resolution.
+
+``DestinationResolver.resolve`` maps what users type to a destination record:
+
+1. exact match on the normalized text (case, accents, punctuation and
+   spacing ignored) against names, aliases and IATA codes
+2. exact match on the leading words, so "Paris, France" and "Tokyo Japan"
+   resolve to Paris and Tokyo
+3. the closest name within a few typos (edit distance, counting a swapped
+   pair of letters as one typo) that also scores at least ``threshold`` on
+   trigram similarity (Dice coefficient), so "Barcelonna" finds Barcelona.
+   Short queries get fewer typos: none up to 3 characters, one up to 6,
+   ``max_edits`` beyond, so "Bern" doesn't become Berlin
+
+``FuzzyIndex`` is the underlying inverted trigram index plus a sorted key
+list for prefix completion. A search only scans the postings of the
+query's few rarest trigrams (prefix filtering with the q-gram bound for the
+edit distance), with postings split by key length so keys of incompatible
+length are never visited; only the survivors get a real edit distance. It stays fast on indexes with 100k+ names (see
+bench_resolver.py). Resolved queries are memoized, and the index is rebuilt
+when the destination dataset changes.
+"""
+
+import math
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+from destinations import DESTINATIONS
+
+
+# Postings longer than this are probed per candidate instead of counted in full
+VERIFY_COST = 150
+
+# One typo changes at most this many trigrams (a swapped pair changes four)
+GRAMS_PER_EDIT = 4
+
+
+def normalize(text):
+    """Case-folded text without accents or punctuation, with single spaces."""
+    text = unicodedata.normalize("NFKD", str(text or "").casefold())
+    text = "".join(
+        char if char.isalnum() else " "
+        for char in text
+        if not unicodedata.combining(char)
+    )
+    return " ".join(text.split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_budget(length, max_edits=2):
+    """Typos tolerated in a query of ``length`` characters."""
+    if length <= 3:
+        return 0
+    if length <= 6:
+        return min(1, max_edits)
+    return max_edits
+
+
+def edit_distance(a, b, limit):
+    """Edit distance between ``a`` and ``b`` (insertions, deletions, substitutions
+    and swaps of adjacent characters), or ``limit + 1`` once it must exceed ``limit``."""
+    # A shared prefix or suffix never changes the distance ("... harbour" names)
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        return len(a) or len(b)
+
+    # Only cells within ``limit`` of the diagonal can stay within ``limit``
+    over = limit + 1
+    before = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        row = [over] * (len(b) + 1)
+        if i <= limit:
+            row[0] = i
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            cost = char != b[j - 1]
+            best = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if cost and i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                best = min(best, before[j - 2] + 1)
+            row[j] = best
+        if min(row[low - 1:high + 1]) > limit:
+            return over
+        before, previous = previous, row
+    return min(previous[-1], over)
+
+
+class FuzzyIndex:
+    def __init__(self, threshold=0.5, max_edits=2):
+        self.threshold = threshold
+        self.max_edits = max_edits
+        self._exact = {}  # normalized key -> value
+        self._keys = []  # key id -> normalized key
+        self._values = []
+        self._postings = {}  # trigram -> {(key length, trigram count of the key): [key ids]}
+        self._buckets = set()  # the (length, count) pairs in use
+        self._sorted = None  # (key, value) sorted by key, built on first completion
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, value, fuzzy=True):
+        """Index ``value`` under ``key``; ``fuzzy=False`` keys only match exactly (e.g. IATA codes)."""
+        key = normalize(key)
+        if not key or key in self._exact:
+            return
+        self._exact[key] = value
+        self._sorted = None
+        if not fuzzy:
+            return
+        key_id = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._values.append(value)
+        bucket = (len(key), len(grams))
+        self._buckets.add(bucket)
+        for gram in grams:
+            self._postings.setdefault(gram, {}).setdefault(bucket, []).append(key_id)
+
+    def exact(self, key):
+        return self._exact.get(normalize(key))
+
+    def search(self, query, limit=5):
+        """``[(score, key, value)]`` for keys within ``edit_budget`` typos of ``query`` and
+        scoring at least ``threshold``, fewest typos first, then best score."""
+        query = normalize(query)
+        grams = trigrams(query)
+        edits = edit_budget(len(query), self.max_edits)
+        if not query or not grams or not edits:
+            return []  # no typos allowed: only an exact match would do
+        size = len(grams)
+        threshold = self.threshold
+        slack = GRAMS_PER_EDIT * edits
+        postings = [self._postings.get(gram, {}) for gram in grams]
+
+        results = []
+        lowest = max(1, size - slack, math.ceil(threshold * size / (2 - threshold)))
+        highest = min(size + slack, math.floor((2 - threshold) * size / threshold))
+        # A key within ``edits`` typos is at most ``edits`` characters longer or shorter
+        buckets = [(length, count)
+                   for length in range(max(1, len(query) - edits), len(query) + edits + 1)
+                   for count in range(lowest, min(highest, length + 1) + 1)
+                   if (length, count) in self._buckets]
+        for bucket in buckets:
+            count = bucket[1]
+            min_shared = max(1, size - slack, count - slack, math.ceil(threshold * (size + count) / 2))
+            if min_shared > min(size, count):
+                continue
+            lists = sorted(filter(None, (by_bucket.get(bucket) for by_bucket in postings)), key=len)
+            if len(lists) < min_shared:
+                continue
+            # Count the short postings in C, then look up only the keys seen often enough in
+            # the long ones: a key gets at most one shared trigram from each long posting
+            skipped = 0
+            while skipped < min_shared - 1 and len(lists[-1 - skipped]) > VERIFY_COST:
+                skipped += 1
+            shared_counts = Counter()
+            for posting in lists[:len(lists) - skipped]:
+                shared_counts.update(posting)
+            long_lists = lists[len(lists) - skipped:]
+            needed = min_shared - skipped
+            for key_id, shared in shared_counts.items():
+                if shared < needed:
+                    continue
+                misses_left = len(long_lists) - (min_shared - shared)
+                for posting in long_lists:  # ids are ascending, so membership is a bisect
+                    i = bisect_left(posting, key_id)
+                    if i < len(posting) and posting[i] == key_id:
+                        shared += 1
+                    else:
+                        misses_left -= 1
+                        if misses_left < 0:
+                            break
+                if shared < min_shared:
+                    continue
+                key = self._keys[key_id]
+                distance = edit_distance(query, key, edits)
+                if distance <= edits:
+                    results.append((distance, 2 * shared / (size + count), key, self._values[key_id]))
+        results.sort(key=lambda result: (result[0], -result[1], result[2]))
+        return [(score, key, value) for _, score, key, value in results[:limit]]
+
+    def complete(self, prefix, limit=10):
+        """``[(key, value)]`` whose key starts with ``prefix``, alphabetically."""
+        if self._sorted is None:
+            self._sorted = sorted(self._exact.items())
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = []
+        entries = self._sorted
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and len(matches) < limit and entries[i][0].startswith(prefix):
+            matches.append(entries[i])
+            i += 1
+        return matches
+
+
+_MISSING = object()
+
+
+class DestinationResolver:
+    def __init__(self, destinations, threshold=0.5, cache_size=8192):
+        self.destinations = destinations
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._cache = {}
+        self.hits = 0
+        self.fuzzy_matches = 0
+        self.misses = 0
+
+    def _current_index(self):
+        if self._version != self.destinations.version:
+            with self._lock:
+                if self._version != self.destinations.version:
+                    index = FuzzyIndex(self.threshold)
+                    for record in self.destinations:
+                        index.add(record.name, record)
+                        for alias in record.aliases:
+                            index.add(alias, record)
+                    # Airport codes are only matched exactly: three letters are too short to fuzz
+                    for record in self.destinations:
+                        if record.iata:
+                            index.add(record.iata, record, fuzzy=False)
+                    self._index = index
+                    self._cache = {}
+                    self._version = self.destinations.version
+        return self._index
+
+    def resolve(self, query):
+        """The destination record ``query`` refers to, or None."""
+        index = self._current_index()
+        key = normalize(query)
+        record = self._cache.get(key, _MISSING)  # clear() may run between a check and a read
+        if record is not _MISSING:
+            return record
+
+        record = index.exact(key)
+        fuzzy = False
+        if record is None:
+            # Drop trailing qualifiers: "paris france", "new york city usa"
+            words = key.split()
+            for end in range(len(words) - 1, 0, -1):
+                record = index.exact(" ".join(words[:end]))
+                if record is not None:
+                    break
+        if record is None and key:
+            matches = index.search(key, limit=1)
+            if not matches and "," in str(query):
+                matches = index.search(str(query).split(",")[0], limit=1)
+            if matches:
+                record = matches[0][2]
+                fuzzy = True
+
+        with self._lock:
+            if record is None:
+                self.misses += 1
+            elif fuzzy:
+                self.fuzzy_matches += 1
+            else:
+                self.hits += 1
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = record
+        return record
+
+    def canonical(self, query):
+        """Canonical display name for ``query``, or the cleaned-up text if it is unknown."""
+        record = self.resolve(query)
+        if record is not None:
+            return record.name
+        cleaned = " ".join(str(query or "").split())
+        return cleaned.title() if cleaned.islower() or cleaned.isupper() else cleaned
+
+    def iata(self, query):
+        record = self.resolve(query)
+        return record.iata if record is not None else None
+
+    def complete(self, prefix, limit=10):
+        """Destination names with a name, alias or code starting with ``prefix``."""
+        names = []
+        for _, record in self._current_index().complete(prefix, limit=limit * 3):
+            if record.name not in names:
+                names.append(record.name)
+        return names[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "destinations": len(self.destinations),
+                "indexedNames": len(self._index) if self._index is not None else 0,
+                "exactHits": self.hits,
+                "fuzzyMatches": self.fuzzy_matches,
+                "misses": self.misses,
+                "cached": len(self._cache),
+            }
+
+
+RESOLVER = DestinationResolver(DESTINATIONS)
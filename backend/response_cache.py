@@ -0,0 +1,133 @@
+"""Response cache for upstream-backed GET handlers.
+
+Each ``ResponseCache`` wraps one endpoint's fetch function with:
+
+- a fresh TTL, after which the entry is still served for ``stale_ttl`` more
+  seconds while one background refresh fetches a new copy
+  (stale-while-revalidate)
+- negative caching: results flagged by ``is_negative`` (e.g. a locally
+  generated fallback after an upstream failure) are kept for the shorter
+  ``negative_ttl``, and never replace a stale good result
+- coalescing of concurrent misses for the same key into one fetch
+
+Entries live in any cache with ``get_entry``/``set`` (usually a
+``TieredCache``), so the shared SQLite tier works here too.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from singleflight import SingleFlight
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+def normalize_key(*parts):
+    """Case- and whitespace-insensitive key from request parameters."""
+    return "|".join(" ".join(str(part or "").split()).casefold() for part in parts)
+
+
+class ResponseCache:
+    def __init__(self, cache, name, ttl, stale_ttl=0, negative_ttl=60, is_negative=None):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative or (lambda value: False)
+        self._flight = SingleFlight()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, fetch):
+        """Return the cached value for ``key``, calling ``fetch()`` on a miss."""
+        value = self.cached(key, fetch)
+        if value is not None:
+            return value
+        return self.load(key, fetch)
+
+    def load(self, key, fetch):
+        """Fetch and store ``key`` after ``cached`` missed, without looking it up again."""
+        self._count("misses")
+        return self._flight.do(self._key(key), lambda: self._store(key, fetch()))
+
+    def cached(self, key, fetch):
+        """The cached value for ``key``, or None on a miss; never waits on ``fetch``.
+
+        A stale entry is returned and refreshed in the background, as in ``get``.
+        """
+        entry = self.cache.get_entry(self._key(key))
+        if entry is None:
+            return None
+        record, _ = entry
+        if record["freshUntil"] > time.time():
+            self._count("negative_hits" if record["negative"] else "hits")
+            return record["value"]
+        if not record["negative"]:
+            self._count("stale_hits")
+            self._refresh(key, fetch, record)
+            return record["value"]
+        return None
+
+    def _store(self, key, value, previous=None):
+        now = time.time()
+        if self.is_negative(value):
+            if previous is not None:
+                # Keep serving the last good result rather than a fallback
+                previous = dict(previous, freshUntil=now + self.negative_ttl)
+                self.cache.set(self._key(key), previous, ttl=self.negative_ttl + self.stale_ttl)
+                return previous["value"]
+            record = {"value": value, "freshUntil": now + self.negative_ttl, "negative": True}
+            self.cache.set(self._key(key), record, ttl=self.negative_ttl)
+        else:
+            record = {"value": value, "freshUntil": now + self.ttl, "negative": False}
+            self.cache.set(self._key(key), record, ttl=self.ttl + self.stale_ttl)
+        return value
+
+    def _refresh(self, key, fetch, previous):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.refreshes += 1
+
+        def run():
+            try:
+                self._store(key, fetch(), previous)
+            except Exception as e:
+                self._count("refresh_errors")
+                print(f"Background refresh of {self.name} {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _refresh_pool.submit(run)
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.stale_hits + self.negative_hits
+            total = served + self.misses
+            return {
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "staleHits": self.stale_hits,
+                "negativeHits": self.negative_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refreshErrors": self.refresh_errors,
+                "hitRatio": round(served / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,214 @@
+"""Typed payloads for the Gemini-generated responses.
+
+Each model is passed to Gemini as ``response_schema`` (via ``gemini_schema``)
+so replies follow the shape, and validates the reply before it is returned
+or cached (``validate``). Fields the UI can live without have defaults; the
+ones it can't are required, so a malformed generation fails fast and can be
+retried. Unknown keys are dropped.
+
+The ``Printable*`` models read an itinerary the client sends back (e.g.
+for the PDF), which may have been edited or cut short: every field is
+optional and unknown keys are kept.
+"""
+
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List
+
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer, create_model
+
+# Money is validated as a number but keeps whole amounts as ints in the JSON
+Money = Annotated[float, PlainSerializer(lambda v: int(v) if float(v).is_integer() else v, return_type=float)]
+
+
+class Payload(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+
+class FlightPrices(Payload):
+    economy: Money
+    premium: Money
+    business: Money
+    currency: str = "USD"
+    origin: str = ""
+    destination: str = ""
+    lastUpdated: str = ""
+
+
+class HotelPrices(Payload):
+    budget: Money
+    standard: Money
+    luxury: Money
+    currency: str = "USD"
+    destination: str = ""
+    perNight: bool = True
+
+
+class Weather(Payload):
+    destination: str = ""
+    temperature: str
+    condition: str
+    humidity: str = ""
+    wind: str = ""
+    description: str = ""
+
+
+class Event(Payload):
+    name: str
+    type: str = "show"
+    venue: str = ""
+    date: str = ""
+    description: str = ""
+
+
+class EventList(Payload):
+    events: List[Event] = Field(min_length=1)
+    destination: str = ""
+
+
+class Activity(Payload):
+    time: str
+    activity: str
+    description: str = ""
+    duration: str = ""
+    cost: Money = 0
+    location: str = ""
+    tips: str = ""
+
+
+class Meals(Payload):
+    breakfast: str = ""
+    lunch: str = ""
+    dinner: str = ""
+
+
+class DayPlan(Payload):
+    day: int
+    title: str
+    activities: List[Activity]
+    meals: Meals = Meals()
+    estimatedDailyCost: Money = 0
+
+
+class CostBreakdown(Payload):
+    flights: Money = 0
+    accommodation: Money = 0
+    activities: Money = 0
+    food: Money = 0
+    transportation: Money = 0
+    buffer: Money = 0
+
+
+class BudgetSummary(Payload):
+    totalEstimated: Money = 0
+    remaining: Money = 0
+    savingsTips: List[str] = []
+
+
+class Itinerary(Payload):
+    destination: str
+    duration: int
+    totalBudget: Money
+    costBreakdown: CostBreakdown
+    recommendedFlight: str = ""
+    recommendedHotel: str = ""
+    dailyItinerary: List[DayPlan] = Field(min_length=1)
+    travelTips: List[str] = []
+    packingList: List[str] = []
+    budgetSummary: BudgetSummary = BudgetSummary()
+
+
+class Printable(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class PrintableActivity(Printable):
+    time: str = ""
+    activity: str = ""
+    description: str = ""
+    cost: Money = 0
+    location: str = ""
+
+
+class PrintableMeals(Printable):
+    breakfast: str = ""
+    lunch: str = ""
+    dinner: str = ""
+
+
+class PrintableDay(Printable):
+    day: int = 1
+    title: str = ""
+    activities: List[PrintableActivity] = []
+    meals: PrintableMeals = PrintableMeals()
+
+
+class PrintableCosts(Printable):
+    flights: Money = 0
+    accommodation: Money = 0
+    activities: Money = 0
+    food: Money = 0
+    transportation: Money = 0
+    buffer: Money = 0
+
+
+class PrintableItinerary(Printable):
+    destination: str = ""
+    duration: int = 3
+    costBreakdown: PrintableCosts = PrintableCosts()
+    dailyItinerary: List[PrintableDay] = []
+    travelTips: List[str] = []
+    packingList: List[str] = []
+
+
+class BatchReply(Payload):
+    """Envelope of a reply to a multi-item prompt; each item is validated on its own once matched to its request."""
+    results: List[Dict[str, Any]] = Field(min_length=1)
+
+
+@lru_cache(maxsize=None)
+def batch_of(model):
+    """Model for ``{"results": [model + "id", ...]}``, the schema Gemini is asked to follow for a multi-item prompt."""
+    item = create_model(f"Batched{model.__name__}", __base__=model, id=(int, ...))
+    return create_model(f"{model.__name__}Batch", __base__=Payload, results=(List[item], Field(min_length=1)))
+
+
+_GEMINI_SCHEMA_KEYS = ("type", "format", "description", "nullable", "enum", "properties", "required", "items")
+
+
+@lru_cache(maxsize=None)
+def gemini_schema(model):
+    """``model``'s JSON schema reduced to the OpenAPI subset Gemini's ``response_schema`` accepts.
+
+    References are inlined; defaults, titles and length constraints are
+    dropped (they are still enforced by ``validate``).
+    """
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+
+    def convert(node):
+        if "$ref" in node:
+            node = definitions[node["$ref"].split("/")[-1]]
+        if "allOf" in node and len(node["allOf"]) == 1:
+            return convert(node["allOf"][0])
+        converted = {}
+        for key in _GEMINI_SCHEMA_KEYS:
+            if key not in node:
+                continue
+            if key == "properties":
+                converted[key] = {name: convert(value) for name, value in node[key].items()}
+            elif key == "items":
+                converted[key] = convert(node[key])
+            else:
+                converted[key] = node[key]
+        return converted
+
+    return convert(schema)
+
+
+def validate(model, data):
+    """Validate ``data`` against ``model`` and return it as a plain, compact dict.
+
+    Raises pydantic.ValidationError for malformed payloads.
+    """
+    return model.model_validate(data).model_dump()
+
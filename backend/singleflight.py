@@ -0,0 +1,115 @@
+"""Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight computation
+instead of each starting their own. Within a worker this uses a future per
+key; across workers an optional ``fcntl`` lock file per key makes the other
+processes wait for the leader and then re-check the shared cache.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process coalescing
+    fcntl = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None, wait_timeout=180):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future
+        self.leaders = 0
+        self.coalesced = 0
+        self.cross_worker_hits = 0
+
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        """Run ``fn()`` once for ``key`` and hand its result to every concurrent caller.
+
+        ``recheck`` is called after waiting on another worker's lock; if it
+        returns something other than None that value is used instead of
+        calling ``fn``.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(timeout=self.wait_timeout)
+
+        try:
+            result = self._run_leader(key, fn, recheck)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return result
+
+    def _run_leader(self, key, fn, recheck):
+        if not self.lock_dir:
+            return fn()
+
+        with self._file_lock(key) as waited:
+            if waited and recheck is not None:
+                value = recheck()
+                if value is not None:
+                    self.cross_worker_hits += 1
+                    return value
+            return fn()
+
+    @contextmanager
+    def _file_lock(self, key):
+        """Hold an exclusive lock file for ``key``; yields True if another worker held it first."""
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock"
+        fd = os.open(os.path.join(self.lock_dir, name), os.O_CREAT | os.O_RDWR, 0o644)
+        locked = False
+        waited = False
+        try:
+            deadline = time.time() + self.wait_timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    waited = True
+                    if time.time() >= deadline:
+                        # Give up on coalescing rather than failing the request
+                        break
+                    time.sleep(0.05)
+            yield waited
+        finally:
+            if locked:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "crossWorkerHits": self.cross_worker_hits,
+            "inFlight": self.in_flight(),
+        }
@@ -0,0 +1,99 @@
+"""Tests for the background asset store (python -m pytest test_assets.py)."""
+
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from assets import BackgroundAssetStore
+
+
+def _png(width=64, height=48, seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Fetcher:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        time.sleep(self.delay)
+        return _png(seed=len(self.urls))
+
+
+def test_first_requests_share_one_download():
+    fetch = Fetcher(delay=0.1)
+    store = BackgroundAssetStore(fetch)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        assets = list(pool.map(lambda _: store.get("https://example.com/eiffel.jpg"), range(6)))
+
+    assert fetch.urls == ["https://example.com/eiffel.jpg"]
+    assert all(asset is assets[0] for asset in assets)
+    assert store.get("https://example.com/eiffel.jpg") is assets[0]
+    assert store.stats()["downloads"] == 1 and store.stats()["hits"] >= 1
+
+
+def test_least_recently_used_asset_is_evicted():
+    fetch = Fetcher()
+    store = BackgroundAssetStore(fetch, max_assets=2)
+    store.get("a")
+    store.get("b")
+    store.get("a")  # "b" is now the least recently used
+    store.get("c")
+
+    assert store.stats()["assets"] == 2
+    store.get("a")
+    assert fetch.urls == ["a", "b", "c"]
+    store.get("b")
+    assert fetch.urls == ["a", "b", "c", "b"]
+
+
+def test_disk_tier_is_shared_by_workers(tmp_path):
+    cache_dir = str(tmp_path / "backgrounds")
+    first = BackgroundAssetStore(Fetcher(), cache_dir=cache_dir)
+    asset = first.get("https://example.com/colosseum.jpg")
+
+    second_fetch = Fetcher()
+    second = BackgroundAssetStore(second_fetch, cache_dir=cache_dir)  # another worker, same host
+    again = second.get("https://example.com/colosseum.jpg")
+
+    assert second_fetch.urls == []
+    assert second.stats()["diskHits"] == 1
+    assert np.array_equal(np.asarray(again.image), np.asarray(asset.image))
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+
+def test_variants_are_scaled_on_first_use():
+    store = BackgroundAssetStore(Fetcher())
+    asset = store.get("x")
+    assert asset._variants == {}
+    assert asset.variant(0) is asset.image
+    assert asset.variant(100) is asset.image  # already narrower
+
+    small = asset.variant(32)
+    assert small.size == (32, 24)
+    assert asset.variant(32) is small
+    assert BackgroundAssetStore(Fetcher(), variant_widths=(32,)).get("y")._variants.keys() == {32}
+
+
+@pytest.mark.parametrize("box", [(0, 30, 64, 40), (5, 30, 20, 40), (63, 30, 64, 40), (10, 0, 50, 48)])
+def test_tint_lookup_matches_a_direct_mean(box):
+    asset = BackgroundAssetStore(Fetcher()).get("z")
+    image = asset.variant()
+    left, top, right, bottom = box
+
+    pixels = np.asarray(image.convert("RGB"), dtype=np.int64)[top:bottom, left:right].reshape(-1, 3)
+    expected = tuple(int(x) for x in pixels.sum(axis=0) // len(pixels))
+    assert asset.region_mean(image, box) == expected
+    assert asset.region_mean(image, box) == expected  # served from the cached band
+    assert asset.region_mean(image, (20, top, 20, bottom)) == (0, 0, 0)
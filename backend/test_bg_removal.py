@@ -0,0 +1,105 @@
+"""Tests for batched background removal with a stub model (python -m pytest test_bg_removal.py)."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from bg_removal import BatchingRemover
+
+
+class StubSession:
+    """Stands in for a rembg u2net session; the predicted mask is the left half."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def normalize(self, image, mean, std, size):
+        return {"input.1": np.zeros((1, 3, size[1], size[0]), dtype=np.float32)}
+
+    @property
+    def inner_session(self):
+        return self
+
+    def run(self, outputs, feed):
+        batch = next(iter(feed.values()))
+        self.batch_sizes.append(len(batch))
+        mask = np.zeros((len(batch), 1, 320, 320), dtype=np.float32)
+        mask[:, :, :, :160] = 1.0
+        return [mask]
+
+
+class StubRemover:
+    def __init__(self, model_name="u2netp"):
+        self.model_name = model_name
+        self.stub_session = StubSession()
+        self.single_calls = 0
+
+    def session(self):
+        return self.stub_session
+
+    def remove(self, image):
+        self.single_calls += 1
+        time.sleep(0.01)
+        return image.convert("RGBA")
+
+
+def _selfie(color):
+    return Image.new("RGB", (64, 48), color)
+
+
+def test_concurrent_requests_are_removed_as_one_batch():
+    remover = StubRemover()
+    batcher = BatchingRemover(remover, max_batch=4, window=0.1)
+    results = [None] * 4
+
+    def remove(i):
+        results[i] = batcher.remove(_selfie((i * 40, 0, 0)))
+
+    threads = [threading.Thread(target=remove, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert remover.stub_session.batch_sizes == [4]
+    for i, cutout in enumerate(results):
+        assert cutout.mode == "RGBA" and cutout.size == (64, 48)
+        assert cutout.getpixel((5, 5)) == (i * 40, 0, 0, 255)  # kept: left half of the mask
+        assert cutout.getpixel((60, 5))[3] == 0  # removed
+    assert batcher.stats()["largestBatch"] == 4
+
+
+def test_batches_are_capped_at_max_batch():
+    remover = StubRemover()
+    batcher = BatchingRemover(remover, max_batch=2, window=0.05)
+    cutouts = batcher.remove_many([_selfie((0, 0, 0)) for _ in range(5)])
+
+    assert len(cutouts) == 5
+    assert max(remover.stub_session.batch_sizes + [1]) <= 2
+    assert batcher.stats()["images"] == 5
+
+
+def test_unbatchable_models_fall_back_to_single_removals():
+    remover = StubRemover(model_name="isnet-general-use")
+    batcher = BatchingRemover(remover, max_batch=4, window=0.05)
+    batcher.remove_many([_selfie((0, 0, 0)) for _ in range(3)])
+
+    assert remover.single_calls == 3
+    assert remover.stub_session.batch_sizes == []
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    remover = StubRemover(model_name="isnet-general-use")
+
+    def failing(image):
+        raise RuntimeError("model missing")
+
+    remover.remove = failing
+    batcher = BatchingRemover(remover, max_batch=4, window=0.05)
+    futures = [batcher.submit(_selfie((0, 0, 0))) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=2)
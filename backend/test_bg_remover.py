@@ -0,0 +1,106 @@
+"""Tests for the managed rembg session and /ready, with fake rembg modules (python -m pytest test_bg_remover.py)."""
+
+import sys
+import threading
+import types
+
+import pytest
+
+from bg_removal import BackgroundRemover
+
+
+class FakeSessionOptions:
+    intra_op_num_threads = 0
+    inter_op_num_threads = 0
+
+
+def _session_class(model):
+    class FakeSession:
+        created = []
+
+        def __init__(self, model_name, sess_opts):
+            self.model_name = model_name
+            self.sess_opts = sess_opts
+            FakeSession.created.append(self)
+
+        @staticmethod
+        def name():
+            return model
+
+    return FakeSession
+
+
+@pytest.fixture
+def fake_rembg(monkeypatch):
+    """Installs fake onnxruntime and rembg modules; yields the list of removals run."""
+    classes = [_session_class("u2net"), _session_class("u2netp")]
+    removals = []
+    release = threading.Event()
+    release.set()
+
+    def remove(image, session=None):
+        release.wait(2)
+        removals.append(session)
+        return image.convert("RGBA")
+
+    rembg = types.ModuleType("rembg")
+    rembg.remove = remove
+    sessions = types.ModuleType("rembg.sessions")
+    sessions.sessions_class = classes
+    rembg.sessions = sessions
+    ort = types.ModuleType("onnxruntime")
+    ort.SessionOptions = FakeSessionOptions
+    monkeypatch.setitem(sys.modules, "rembg", rembg)
+    monkeypatch.setitem(sys.modules, "rembg.sessions", sessions)
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    return types.SimpleNamespace(classes=classes, removals=removals, release=release)
+
+
+def test_configured_model_and_threads_are_applied(fake_rembg):
+    remover = BackgroundRemover("u2netp", intra_op_threads=2, inter_op_threads=1)
+    session = remover.session()
+
+    assert session.model_name == "u2netp"
+    assert type(session).name() == "u2netp"
+    assert session.sess_opts.intra_op_num_threads == 2
+    assert session.sess_opts.inter_op_num_threads == 1
+    assert remover.session() is session  # loaded once per worker
+    assert remover.status()["loadSeconds"] is not None
+
+
+def test_unknown_model_is_reported(fake_rembg):
+    remover = BackgroundRemover("no-such-model")
+    assert remover.warmup() is False
+    assert remover.status()["error"] == "Unknown rembg model: no-such-model"
+    assert not remover.ready
+
+
+def test_app_builds_its_remover_from_the_environment(backend):
+    assert backend.background_remover.model_name == backend.REMBG_MODEL
+    assert backend.background_remover.intra_op_threads == backend.REMBG_INTRA_OP_THREADS
+
+
+def test_warmup_runs_one_removal_and_sets_ready(fake_rembg):
+    remover = BackgroundRemover("u2net")
+    remover.start_warmup().join(timeout=2)
+
+    assert remover.ready
+    assert len(fake_rembg.removals) == 1
+    assert fake_rembg.removals[0] is remover.session()
+
+
+def test_ready_is_503_until_the_model_is_warm(backend, client, fake_rembg, monkeypatch):
+    remover = BackgroundRemover("u2net")
+    monkeypatch.setattr(backend, "background_remover", remover)
+    fake_rembg.release.clear()  # hold the warm-up inside the model call
+
+    warmup = remover.start_warmup()
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["ready"] is False
+
+    fake_rembg.release.set()
+    warmup.join(timeout=2)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["backgroundRemoval"]["model"] == "u2net"
@@ -0,0 +1,102 @@
+"""Tests for the memory, SQLite and tiered caches (python -m pytest test_cache.py)."""
+
+import threading
+import time
+
+from cache import MemoryCache, SQLiteCache, TieredCache
+
+
+def test_memory_cache_hits_misses_and_expiry():
+    cache = MemoryCache(ttl=60)
+    cache.set("a", {"x": 1})
+    cache.set("b", {"x": 2}, ttl=-1)
+
+    assert cache.get("a") == {"x": 1}
+    assert cache.get("b") is None
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_respects_byte_limit():
+    cache = MemoryCache(max_bytes=100)
+    assert cache.set("big", "x" * 200) is False
+    for i in range(10):
+        cache.set(f"k{i}", "y" * 20)
+
+    assert cache.stats()["bytes"] <= 100
+    assert "k9" in cache and "k0" not in cache
+
+
+def test_memory_cache_is_thread_safe():
+    cache = MemoryCache(max_entries=50)
+
+    def hammer(n):
+        for i in range(500):
+            cache.set(f"{n}-{i % 80}", i)
+            cache.get(f"{(n + 1) % 4}-{i % 80}")
+
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["entries"] == len(cache) <= 50
+    assert stats["hits"] + stats["misses"] == 2000
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = SQLiteCache(path, namespace="itinerary")
+    reader = SQLiteCache(path, namespace="itinerary")
+    other = SQLiteCache(path, namespace="other")
+
+    writer.set("trip", {"days": 3})
+    assert reader.get("trip") == {"days": 3}
+    assert other.get("trip") is None
+
+    writer.set("old", 1, ttl=-1)
+    assert reader.get("old") is None
+
+
+def test_sqlite_cache_evicts_least_recently_read(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), max_bytes=30)  # two 12-byte values fit
+    cache.set("a", "x" * 10)
+    time.sleep(0.01)
+    cache.set("b", "y" * 10)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", "z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.stats()["evictions"] == 1
+
+
+def test_tiered_cache_promotes_shared_hits(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = TieredCache(MemoryCache(), SQLiteCache(path))
+    second = TieredCache(MemoryCache(), SQLiteCache(path))
+
+    first.set("trip", {"days": 5}, ttl=60)
+    assert "trip" not in second
+    assert second.get("trip") == {"days": 5}
+    assert "trip" in second  # promoted into the second worker's memory tier
+
+    _, expires_at = second.memory.get_entry("trip")
+    assert expires_at <= time.time() + 60
+    assert second.stats()["hits"] == 1
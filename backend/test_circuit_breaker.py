@@ -0,0 +1,88 @@
+"""Tests for the circuit breaker (python -m pytest test_circuit_breaker.py)."""
+
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+def _fail(breaker, times=1):
+    for _ in range(times):
+        breaker.allow()
+        breaker.record(0.01, error=RuntimeError("502"))
+
+
+def test_opens_on_error_rate_and_fails_fast():
+    breaker = CircuitBreaker("serpapi", min_calls=4, error_rate=0.5, open_seconds=30)
+    breaker.allow()
+    breaker.record(0.01)
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED  # three calls: under min_calls
+    _fail(breaker)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen) as excinfo:
+        breaker.allow()
+    assert 0 < excinfo.value.retry_after <= 30
+    snapshot = breaker.snapshot()
+    assert snapshot["rejected"] == 1 and snapshot["opened"] == 1
+    assert snapshot["lastError"] == "502"
+
+
+def test_opens_when_calls_are_mostly_slow():
+    breaker = CircuitBreaker("gemini", min_calls=3, slow_seconds=1, slow_rate=0.6)
+    for _ in range(3):
+        breaker.allow()
+        breaker.record(2.5)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("replicate", min_calls=1, open_seconds=0.05)
+    _fail(breaker)
+    time.sleep(0.06)
+
+    assert breaker.state == HALF_OPEN
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()  # the trial is still running
+    breaker.record(0.01)
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_opens_the_circuit_again():
+    breaker = CircuitBreaker("images", min_calls=1, open_seconds=0.05)
+    _fail(breaker)
+    time.sleep(0.06)
+    _fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["opened"] == 2
+
+
+def test_guard_records_outcomes_and_notifies_the_observer():
+    seen = []
+    breaker = CircuitBreaker("serpapi", min_calls=10, observer=lambda name, seconds, error: seen.append(error))
+    with breaker.guard():
+        pass
+    with pytest.raises(ValueError):
+        with breaker.guard():
+            raise ValueError("bad gateway")
+
+    assert seen[0] is None and isinstance(seen[1], ValueError)
+    assert breaker.snapshot()["errorRate"] == 0.5
+
+
+def test_trial_interrupted_by_a_base_exception_is_released():
+    breaker = CircuitBreaker("gemini", min_calls=1, open_seconds=0.05)
+    _fail(breaker)
+    time.sleep(0.06)
+
+    with pytest.raises(KeyboardInterrupt):
+        with breaker.guard():
+            raise KeyboardInterrupt
+    assert breaker.state == OPEN  # the trial counted as a failure instead of holding the slot
+    time.sleep(0.06)
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
@@ -0,0 +1,70 @@
+"""Tests for the destination reference data (python -m pytest test_destinations.py)."""
+
+import json
+
+import pytest
+
+from destinations import DEFAULT_DATA_FILE, DestinationIndex
+from resolver import DestinationResolver
+
+
+@pytest.fixture
+def dataset():
+    return DestinationIndex().load(DEFAULT_DATA_FILE)
+
+
+@pytest.fixture
+def extra_file(tmp_path):
+    """A DESTINATIONS_FILE overriding Paris and adding Porto."""
+    path = tmp_path / "destinations.json"
+    path.write_text(json.dumps({"destinations": [
+        {"name": "Paris", "aliases": ["ville lumiere"], "iata": "ORY", "flight": 999},
+        {"name": "Porto", "aliases": ["oporto"], "iata": "OPO", "flight": 420, "hotel": [50, 90, 250]},
+    ]}), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("query", ["Lisbon", "lisbon", "  LISBON ", "Lisboa", "LISBOA"])
+def test_names_and_aliases_resolve_in_any_case(dataset, query):
+    assert dataset.get(query).name == "Lisbon"
+
+
+def test_multi_word_names_ignore_spacing(dataset):
+    assert dataset.get("hong   kong").name == "Hong Kong"
+    assert dataset.get("HK").name == "Hong Kong"
+
+
+def test_unknown_destinations_get_the_defaults(dataset):
+    assert dataset.get("Atlantis") is None
+    record = dataset.lookup("Atlantis")
+    assert record.name == "Atlantis" and not record.known
+    assert record.flight_price == dataset.defaults.flight_price
+    assert record.hotel == dataset.defaults.hotel
+
+
+def test_extra_file_overrides_and_adds_records(dataset, extra_file):
+    count = len(dataset)
+    original_hotel = dataset.get("Paris").hotel
+    dataset.load(extra_file)
+
+    assert len(dataset) == count + 1
+    paris = dataset.get("paris")
+    assert (paris.iata, paris.flight_price) == ("ORY", 999)
+    assert paris.hotel == dataset.defaults.hotel != original_hotel  # fields left out fall back to the defaults
+    assert dataset.get("Ville Lumiere") is paris
+    porto = dataset.get("OPORTO")
+    assert (porto.name, porto.iata, porto.hotel.standard) == ("Porto", "OPO", 90)
+    assert dataset.names()[-1] == "Porto"
+
+
+def test_loading_bumps_the_version_so_the_resolver_rebuilds(dataset, extra_file):
+    resolver = DestinationResolver(dataset)
+    assert resolver.resolve("Portoo") is None
+    assert resolver.iata("Paris") == "CDG"
+    version = dataset.version
+
+    dataset.load(extra_file)
+
+    assert dataset.version > version
+    assert resolver.resolve("Portoo").name == "Porto"
+    assert resolver.iata("Paris") == "ORY"
@@ -0,0 +1,177 @@
+"""Tests for the shared HTTP client's session pool and retries (python -m pytest test_http_client.py)."""
+
+import io
+import time
+
+import pytest
+import requests
+
+import http_client
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpen
+from http_client import HttpClient
+
+HOST = "serpapi.example.com"
+URL = f"https://{HOST}/search"
+
+
+def _response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b"")
+    return response
+
+
+class StubSession:
+    """Plays back a script of responses and exceptions, one per request."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls.append((method, url, timeout))
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _response(outcome) if isinstance(outcome, int) else outcome
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(http_client.time, "sleep", slept.append)
+    return slept
+
+
+def _client(script, **upstream):
+    client = HttpClient()
+    client.register("serpapi", **upstream)
+    session = client._sessions[HOST] = StubSession(script)
+    return client, session
+
+
+def test_sessions_are_reused_per_host():
+    client = HttpClient()
+    assert client.session("serpapi.com") is client.session("serpapi.com")
+    assert client.session("serpapi.com") is not client.session("images.example.com")
+
+
+def test_least_recently_used_session_is_closed_when_over_the_cap():
+    client = HttpClient(max_sessions=2)
+    closed = []
+    for host in ("a.example.com", "b.example.com"):
+        client.session(host).close = lambda host=host: closed.append(host)
+    client.session("a.example.com")  # "b" is now the least recently used
+    client.session("c.example.com")
+
+    assert closed == ["b.example.com"]
+    assert list(client._sessions) == ["a.example.com", "c.example.com"]
+
+
+def test_connection_errors_timeouts_and_retryable_statuses_are_retried(sleeps):
+    client, session = _client([requests.ConnectionError("reset"), requests.Timeout("slow"), 503, 200],
+                              retries=3, read_timeout=7)
+    response = client.get(URL, upstream="serpapi")
+
+    assert response.status_code == 200
+    assert len(session.calls) == 4
+    assert session.calls[0][2] == (3.05, 7)
+    assert len(sleeps) == 3 and all(0 <= delay <= 2.0 for delay in sleeps)
+
+
+def test_non_retryable_status_is_returned_at_once(sleeps):
+    client, session = _client([404], retries=3)
+    assert client.get(URL, upstream="serpapi").status_code == 404
+    assert len(session.calls) == 1 and sleeps == []
+
+
+def test_post_is_not_retried_by_default(sleeps):
+    client, session = _client([503, 200], retries=3)
+    assert client.request("POST", URL, upstream="serpapi").status_code == 503
+    assert len(session.calls) == 1
+
+
+def test_retry_after_is_honoured_up_to_max_backoff(sleeps):
+    client, _ = _client([_response(429, {"Retry-After": "0.5"}), _response(429, {"Retry-After": "60"}), 200],
+                        retries=2, max_backoff=2.0)
+    assert client.get(URL, upstream="serpapi").status_code == 200
+    assert sleeps == [0.5, 2.0]
+
+
+def test_retry_budget_is_respected(sleeps):
+    client, session = _client([requests.ConnectionError("down")] * 5, retries=2)
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL, upstream="serpapi")
+    assert len(session.calls) == 3
+
+    client, session = _client([503] * 5, retries=1)
+    assert client.get(URL, upstream="serpapi").status_code == 503
+    assert len(session.calls) == 2
+
+
+def test_breaker_sees_one_outcome_per_call_after_retries(sleeps):
+    outcomes = []
+    breaker = CircuitBreaker("serpapi", min_calls=10, observer=lambda name, seconds, error: outcomes.append(error))
+    client, _ = _client([requests.Timeout("slow"), 502, 200], retries=2, breaker=breaker)
+
+    client.get(URL, upstream="serpapi")
+    assert outcomes == [None]
+
+    client._sessions[HOST].script = [requests.ConnectionError("down")] * 3
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL, upstream="serpapi")
+    assert len(outcomes) == 2 and isinstance(outcomes[1], requests.ConnectionError)
+
+    client._sessions[HOST].script = [503, 503, 503]
+    client.get(URL, upstream="serpapi")
+    assert outcomes[2] == "HTTP 503"
+
+
+def test_errors_and_retries_are_counted_per_host(sleeps):
+    client, _ = _client([requests.ConnectionError("reset"), 500, 200], retries=2)
+    client._sessions["images.example.com"] = StubSession([200])
+    client.get(URL, upstream="serpapi")
+    client.get("https://images.example.com/eiffel.jpg")
+
+    stats = client.stats()
+    assert (stats[HOST]["requests"], stats[HOST]["errors"], stats[HOST]["retries"]) == (3, 2, 2)
+    assert (stats["images.example.com"]["requests"], stats["images.example.com"]["errors"]) == (1, 0)
+
+
+def test_unexpected_error_during_a_half_open_trial_releases_it():
+    breaker = CircuitBreaker("serpapi", min_calls=1, open_seconds=0.05)
+    client, _ = _client([ValueError("bad header")], retries=0, breaker=breaker)
+    breaker.allow()
+    breaker.record(0.01, error="HTTP 503")
+    time.sleep(0.06)
+
+    with pytest.raises(ValueError):
+        client.get(URL, upstream="serpapi")
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    client._sessions[HOST].script = [200]
+    assert client.get(URL, upstream="serpapi").status_code == 200
+    assert breaker.state == CLOSED
+
+
+def test_breaker_factory_gives_each_host_its_own_circuit():
+    client = HttpClient()
+    client.register("images", retries=0, max_breakers=2,
+                    breaker_factory=lambda host: CircuitBreaker(f"images:{host}", min_calls=1))
+    client._sessions["dead.example.com"] = StubSession([requests.ConnectionError("down")])
+    client._sessions["upload.wikimedia.org"] = StubSession([200])
+
+    with pytest.raises(requests.ConnectionError):
+        client.get("https://dead.example.com/a.jpg", upstream="images")
+    with pytest.raises(CircuitOpen):
+        client.get("https://dead.example.com/b.jpg", upstream="images")
+    assert client.get("https://upload.wikimedia.org/eiffel.jpg", upstream="images").status_code == 200
+
+    breakers = client.upstream("images").breakers()
+    assert breakers["dead.example.com"].state == OPEN
+    assert breakers["upload.wikimedia.org"].state == CLOSED
+
+    client._sessions["replicate.delivery"] = StubSession([200])
+    client.get("https://replicate.delivery/out.png", upstream="images")
+    assert list(client.upstream("images").breakers()) == ["upload.wikimedia.org", "replicate.delivery"]
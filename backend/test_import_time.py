@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Import-time report and budget check for the backend.
+
+Imports app in a fresh interpreter under ``python -X importtime`` (with the
+background preloads off), prints the slowest imports and fails if startup
+takes longer than IMPORT_BUDGET_SECONDS or pulls in one of the SDKs that
+are meant to load lazily.
+
+    python test_import_time.py              # report + checks
+    python test_import_time.py --top 30     # longer report
+    python -m pytest test_import_time.py    # checks only
+"""
+
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", 1.0))
+
+# Loaded on first use or by the background preload, never by "import app"
+LAZY_MODULES = ("google.generativeai", "replicate", "reportlab", "rembg", "onnxruntime", "httpx")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile():
+    """Import app under -X importtime; returns [(cumulative_s, self_s, depth, module)] in import order."""
+    env = dict(os.environ)
+    for key in ("REPLICATE_API_TOKEN", "SERPAPI_API_KEY", "GEMINI_API_KEY"):
+        env.setdefault(key, "import-time-check")
+    env.update(REMBG_PRELOAD="0", BACKGROUND_PRELOAD="0", LAZY_PRELOAD="0", PREWARM_ENABLED="0")
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import app failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, depth, name.strip()))
+    return rows
+
+
+def total_seconds(rows):
+    return next(cumulative for cumulative, _, _, name in rows if name == "app")
+
+
+def lazy_modules_imported(rows):
+    names = {name for _, _, _, name in rows}
+    return sorted(lazy for lazy in LAZY_MODULES if lazy in names)
+
+
+def report(rows, top=15):
+    print(f"import app: {total_seconds(rows):.3f}s (budget {IMPORT_BUDGET_SECONDS:.3f}s)")
+    print("\nSlowest imports directly under app (cumulative):")
+    direct = sorted((row for row in rows if row[2] == 1), reverse=True)[:top]
+    for cumulative, _, _, name in direct:
+        print(f"  {cumulative * 1000:8.1f} ms  {name}")
+    print("\nSlowest modules overall (self time):")
+    for cumulative, self_time, _, name in sorted(rows, key=lambda row: row[1], reverse=True)[:top]:
+        print(f"  {self_time * 1000:8.1f} ms  {name}")
+
+
+def test_import_budget():
+    seconds = total_seconds(import_profile())
+    assert seconds <= IMPORT_BUDGET_SECONDS, f"import app took {seconds:.3f}s, budget {IMPORT_BUDGET_SECONDS}s"
+
+
+def test_heavy_sdks_are_lazy():
+    imported = lazy_modules_imported(import_profile())
+    assert not imported, f"import app loaded {', '.join(imported)} eagerly"
+
+
+if __name__ == "__main__":
+    top = int(sys.argv[sys.argv.index("--top") + 1]) if "--top" in sys.argv else 15
+    rows = import_profile()
+    report(rows, top)
+
+    failures = []
+    if total_seconds(rows) > IMPORT_BUDGET_SECONDS:
+        failures.append(f"over budget by {total_seconds(rows) - IMPORT_BUDGET_SECONDS:.3f}s")
+    imported = lazy_modules_imported(rows)
+    if imported:
+        failures.append(f"lazily loaded SDKs imported eagerly: {', '.join(imported)}")
+
+    if failures:
+        print("\n❌ " + "; ".join(failures))
+        sys.exit(1)
+    print("\n✅ Within the import budget")
@@ -0,0 +1,65 @@
+"""Tests for itinerary cache keys and budget rescaling (python -m pytest test_itinerary_keys.py)."""
+
+import pytest
+
+from itinerary_keys import (BUDGET_BANDS, budget_band, canonical_destination, itinerary_key, neighbour_bands,
+                            normalize_interests, parse_budget, rescale_itinerary)
+
+
+@pytest.mark.parametrize("typed", ["paris ", "Paris, France", "PARIS", "Pariss"])
+def test_spellings_of_one_destination_share_a_name(typed):
+    assert canonical_destination(typed) == "Paris"
+
+
+def test_unknown_destinations_keep_the_users_text():
+    assert canonical_destination("Atlantis") == "Atlantis"
+
+
+def test_budget_bands():
+    assert budget_band(2000) == budget_band(2050)
+    assert budget_band(1999) == budget_band(2000) - 1
+    assert budget_band(0) == 0
+    assert budget_band(10 ** 9) == len(BUDGET_BANDS) - 1
+    assert neighbour_bands(0) == [1]
+    assert neighbour_bands(5) == [4, 6]
+
+
+def test_interests_are_normalized():
+    assert normalize_interests(" Food ,museums,food,, ") == ["food", "museums"]
+    assert normalize_interests(["Night  Life", "ART"]) == ["art", "night life"]
+    assert normalize_interests(None) == []
+
+
+def test_equivalent_requests_build_the_same_key():
+    a = itinerary_key(canonical_destination("paris "), "NYC", 3, budget_band(2000), normalize_interests("Food,Art"))
+    b = itinerary_key(canonical_destination("Paris, France"), "nyc", 3, budget_band(2050),
+                      normalize_interests(["art", "food"]))
+    assert a == b
+    assert itinerary_key("Paris", "NYC", 3, 7, []).endswith("_general")
+
+
+def test_rescale_scales_aggregate_money_fields_only():
+    itinerary = {
+        "totalBudget": 2000,
+        "costBreakdown": {"flights": 800, "hotels": 1000, "note": "approx"},
+        "budgetSummary": {"totalEstimated": 1800, "remaining": 200},
+        "dailyItinerary": [{"estimatedDailyCost": 100, "activities": [{"cost": 30}]}],
+        "realPricing": {"flights": 750},
+    }
+    scaled = rescale_itinerary(itinerary, 2000, 3000)
+
+    assert scaled["totalBudget"] == 3000
+    assert scaled["costBreakdown"] == {"flights": 1200, "hotels": 1500, "note": "approx"}
+    assert scaled["budgetSummary"] == {"totalEstimated": 2700, "remaining": 300}
+    assert scaled["dailyItinerary"][0]["estimatedDailyCost"] == 150
+    assert scaled["dailyItinerary"][0]["activities"][0]["cost"] == 30
+    assert scaled["realPricing"] == {"flights": 750}
+    assert scaled["generatedForBudget"] == 2000
+    assert itinerary["totalBudget"] == 2000  # the cached copy is untouched
+    assert rescale_itinerary(itinerary, 2000, 2000) is itinerary
+
+
+@pytest.mark.parametrize("value, expected", [("1500", 1500), (99.5, 99.5), ("abc", 2000), (None, 2000),
+                                             (-5, 2000), (float("nan"), 2000), (float("inf"), 2000)])
+def test_parse_budget(value, expected):
+    assert parse_budget(value) == expected
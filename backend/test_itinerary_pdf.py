@@ -0,0 +1,21 @@
+"""Tests for the itinerary PDF endpoint (python -m pytest test_itinerary_pdf.py)."""
+
+
+def test_partial_itinerary_still_prints(client):
+    # No totalBudget, costBreakdown or activity times, plus a key the schema doesn't know
+    itinerary = {
+        "destination": "Lisbon",
+        "dailyItinerary": [{"day": 1, "activities": [{"activity": "Tram 28", "cost": "3.5"}]}, {"title": "Free day"}],
+        "userNotes": "edited in the app",
+    }
+    response = client.post("/generate-itinerary-pdf", json={"itinerary": itinerary})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert response.data.startswith(b"%PDF")
+
+
+def test_wrongly_typed_itinerary_is_a_400(client):
+    response = client.post("/generate-itinerary-pdf", json={"itinerary": {"dailyItinerary": "day one"}})
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Invalid itinerary data")
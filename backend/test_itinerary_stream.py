@@ -0,0 +1,58 @@
+"""Tests for the streamed itinerary endpoint with a stub Gemini model (python -m pytest test_itinerary_stream.py)."""
+
+import pytest
+
+from circuit_breaker import CircuitBreaker
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def generate_content(self, prompt, stream=False):
+        for text in self.chunks:
+            yield Chunk(text)
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def breaker(backend, monkeypatch):
+    breaker = CircuitBreaker("gemini", min_calls=1, error_rate=0.5)
+    monkeypatch.setitem(backend.circuit_breakers, "gemini", breaker)
+    monkeypatch.setattr(backend, "_cached_itinerary", lambda params, cache_key: None)
+    monkeypatch.setattr(backend, "gather_trip_data", lambda destination, origin: {
+        name: backend._source_estimate(name, destination) for name in ("flights", "hotels", "events", "weather")})
+    return breaker
+
+
+def _stream(backend, client, monkeypatch, model):
+    monkeypatch.setattr(backend, "_itinerary_model", lambda: model)
+    response = client.post("/generate-ai-itinerary/stream", json={"destination": "Lisbon"})
+    return response.get_data(as_text=True)
+
+
+def test_gemini_failing_mid_stream_counts_against_the_breaker(backend, client, monkeypatch, breaker):
+    body = _stream(backend, client, monkeypatch, StubModel(['{"destination": "Lisbon", "dailyItinerary": ['],
+                                          error=ConnectionError("stream reset")))
+
+    assert "event: error" in body
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == "open"
+    assert snapshot["lastError"] == "stream reset"
+
+
+def test_completed_stream_is_recorded_as_a_success(backend, client, monkeypatch, breaker):
+    body = _stream(backend, client, monkeypatch, StubModel(['{"destination": "Lisbon", "dailyItinerary": [{"day": 1,',
+                                           ' "title": "Alfama", "activities": []}]}']))
+
+    assert "event: day" in body
+    snapshot = breaker.snapshot()
+    assert snapshot["recentCalls"] == 1
+    assert snapshot["errorRate"] == 0.0
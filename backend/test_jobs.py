@@ -0,0 +1,96 @@
+"""Tests for the background job runner (python -m pytest test_jobs.py)."""
+
+import threading
+import time
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+
+
+def _wait_until_finished(job, timeout=2):
+    version = -1
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        version = job.wait_for_change(version, timeout=0.1)
+    return job
+
+
+def test_job_reports_progress_and_result():
+    manager = JobManager(max_workers=1)
+    seen = []
+
+    def run(job):
+        job.update(stage="rendering", progress=50)
+        seen.append(job.to_dict(include_result=False)["stage"])
+        return {"imageUrl": "/img"}
+
+    job = _wait_until_finished(manager.submit(run))
+    assert seen == ["rendering"]
+    assert job.status == "succeeded" and job.progress == 100
+    assert job.to_dict()["result"] == {"imageUrl": "/img"}
+    assert "result" not in job.to_dict(include_result=False)
+    assert manager.get(job.id) is job
+
+
+def test_failures_are_recorded_on_the_job():
+    manager = JobManager(max_workers=1)
+
+    def run(job):
+        raise RuntimeError("replicate down")
+
+    job = _wait_until_finished(manager.submit(run))
+    assert job.status == "failed"
+    assert job.to_dict()["error"] == "replicate down"
+    assert manager.stats()["failed"] == 1
+
+
+def test_submit_rejects_when_too_many_jobs_are_pending():
+    manager = JobManager(max_workers=1, max_pending=2)
+    release = threading.Event()
+    jobs = [manager.submit(lambda job: release.wait()) for _ in range(2)]
+
+    with pytest.raises(JobQueueFull):
+        manager.submit(lambda job: None)
+    assert manager.stats()["rejected"] == 1
+
+    release.set()
+    for job in jobs:
+        _wait_until_finished(job)
+    manager.submit(lambda job: None)  # capacity is back
+
+
+def test_wait_for_change_wakes_on_update():
+    manager = JobManager(max_workers=1)
+    step = threading.Event()
+    job = manager.submit(lambda job: step.wait())
+    version = job.wait_for_change(-1, timeout=1)
+
+    started = time.monotonic()
+    threading.Timer(0.05, step.set).start()
+    new_version = job.wait_for_change(version, timeout=2)
+    assert new_version != version
+    assert time.monotonic() - started < 1
+
+
+def test_finished_jobs_expire():
+    manager = JobManager(max_workers=1, ttl=0)
+    job = _wait_until_finished(manager.submit(lambda job: "done"))
+    manager.submit(lambda job: None)  # submitting purges expired jobs
+    assert manager.get(job.id) is None
+
+
+def test_expired_jobs_are_dropped_on_lookup():
+    manager = JobManager(max_workers=1, ttl=0.05)
+    job = _wait_until_finished(manager.submit(lambda job: b"jpeg bytes"))
+    time.sleep(0.06)
+    assert manager.get(job.id) is None  # no new submit needed
+
+
+def test_sweeper_drops_expired_jobs_of_an_idle_worker():
+    manager = JobManager(max_workers=1, ttl=0.05, sweep_interval=0.05)
+    job = _wait_until_finished(manager.submit(lambda job: b"jpeg bytes"))
+    deadline = time.time() + 2
+    while job.id in manager._jobs and time.time() < deadline:
+        time.sleep(0.02)
+    assert job.id not in manager._jobs
@@ -0,0 +1,56 @@
+"""Tests for the incremental JSON object parser (python -m pytest test_json_stream.py)."""
+
+import json
+
+from json_stream import JSONObjectStream
+
+ITINERARY = {
+    "destination": "Paris, France",
+    "totalDays": 2,
+    "notes": "Bring a {jacket}, \"really\"",
+    "dailyItinerary": [
+        {"day": 1, "activities": [{"name": "Louvre"}]},
+        {"day": 2, "activities": []},
+    ],
+    "budget": {"total": 900},
+}
+
+
+def _feed_in_chunks(stream, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(stream.feed(text[i:i + size]))
+    return events
+
+
+def test_members_and_array_elements_arrive_as_they_complete():
+    text = "```json\n" + json.dumps(ITINERARY, indent=2) + "\n```"
+    for size in (1, 7, len(text)):
+        stream = JSONObjectStream(stream_arrays={"dailyItinerary"})
+        events = _feed_in_chunks(stream, text, size)
+
+        assert events == [
+            ("destination", "Paris, France", None),
+            ("totalDays", 2, None),
+            ("notes", "Bring a {jacket}, \"really\"", None),
+            ("dailyItinerary", ITINERARY["dailyItinerary"][0], 0),
+            ("dailyItinerary", ITINERARY["dailyItinerary"][1], 1),
+            ("dailyItinerary", ITINERARY["dailyItinerary"], None),
+            ("budget", {"total": 900}, None),
+        ]
+        assert stream.done
+        assert json.loads(stream.text()) == ITINERARY
+
+
+def test_first_element_is_reported_before_the_array_closes():
+    stream = JSONObjectStream(stream_arrays={"dailyItinerary"})
+    events = stream.feed('{"dailyItinerary": [{"day": 1}, {"day"')
+    assert events == [("dailyItinerary", {"day": 1}, 0)]
+    assert not stream.done
+
+
+def test_unparseable_values_are_skipped():
+    stream = JSONObjectStream()
+    events = stream.feed('{"a": nope, "b": 2}')
+    assert events == [("b", 2, None)]
+    assert stream.done
@@ -0,0 +1,133 @@
+"""Tests for micro-batching of LLM requests with stub prompts (python -m pytest test_llm_batcher.py)."""
+
+import json
+import threading
+
+import pytest
+from pydantic import ValidationError
+
+from llm_batcher import BatchItemMissing, LLMBatcher, split_results
+
+
+class StubLLM:
+    def __init__(self, drop=()):
+        self.batches = []
+        self.singles = []
+        self.drop = set(drop)
+        self._lock = threading.Lock()
+
+    def run_batch(self, keys):
+        with self._lock:
+            self.batches.append(list(keys))
+        return {key: f"batch:{key[0]}" for key in keys if key[0] not in self.drop}
+
+    def run_one(self, destination):
+        with self._lock:
+            self.singles.append(destination)
+        return f"single:{destination}"
+
+
+def _submit_together(batcher, destinations):
+    futures = [batcher.submit(destination) for destination in destinations]
+    return [future.result(timeout=2) for future in futures]
+
+
+def test_concurrent_requests_share_one_batch_and_duplicates_are_asked_once():
+    llm = StubLLM()
+    batcher = LLMBatcher("hotels", llm.run_batch, llm.run_one, window=0.1)
+    results = _submit_together(batcher, ["Paris", "Rome", "Paris", "Oslo"])
+
+    assert results == ["batch:Paris", "batch:Rome", "batch:Paris", "batch:Oslo"]
+    assert llm.batches == [[("Paris",), ("Rome",), ("Oslo",)]]
+    stats = batcher.stats()
+    assert stats["requests"] == 4 and stats["llmCalls"] == 1 and stats["callsSaved"] == 3
+    assert stats["largestBatch"] == 3
+
+
+def test_a_lone_request_keeps_the_single_prompt():
+    llm = StubLLM()
+    batcher = LLMBatcher("weather", llm.run_batch, llm.run_one, window=0.01)
+    assert batcher.call("Lima") == "single:Lima"
+    assert llm.singles == ["Lima"] and llm.batches == []
+
+
+def test_batches_are_capped_at_max_batch():
+    llm = StubLLM()
+    batcher = LLMBatcher("flights", llm.run_batch, llm.run_one, max_batch=2, window=0.1)
+    results = _submit_together(batcher, ["A", "B", "C", "D", "E"])
+
+    assert results == ["batch:A", "batch:B", "batch:C", "batch:D", "single:E"]
+    assert all(len(batch) <= 2 for batch in llm.batches)
+
+
+def test_items_missing_from_the_reply_fail_alone():
+    llm = StubLLM(drop={"Rome"})
+    batcher = LLMBatcher("hotels", llm.run_batch, llm.run_one, window=0.1)
+    paris, rome = batcher.submit("Paris"), batcher.submit("Rome")
+
+    assert paris.result(timeout=2) == "batch:Paris"
+    with pytest.raises(BatchItemMissing):
+        rome.result(timeout=2)
+
+
+def test_an_item_mapped_to_an_exception_fails_alone():
+    def run_batch(keys):
+        return {key: ValueError("bad item") if key == ("Rome",) else f"batch:{key[0]}" for key in keys}
+
+    batcher = LLMBatcher("hotels", run_batch, lambda destination: "unused", window=0.1)
+    paris, rome = batcher.submit("Paris"), batcher.submit("Rome")
+
+    assert paris.result(timeout=2) == "batch:Paris"
+    with pytest.raises(ValueError):
+        rome.result(timeout=2)
+
+
+def test_a_failed_batch_fails_every_caller():
+    def failing(keys):
+        raise RuntimeError("quota exceeded")
+
+    batcher = LLMBatcher("hotels", failing, lambda destination: "unused", window=0.1)
+    futures = [batcher.submit(name) for name in ("Paris", "Rome")]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=2)
+    assert batcher.stats()["errors"] == 1
+
+
+def test_window_zero_turns_batching_off():
+    llm = StubLLM()
+    batcher = LLMBatcher("hotels", llm.run_batch, llm.run_one, window=0)
+    assert _submit_together(batcher, ["Paris", "Rome"]) == ["single:Paris", "single:Rome"]
+    assert llm.batches == []
+    assert batcher.stats()["enabled"] is False
+
+
+def test_split_results_maps_ids_back_to_keys():
+    keys = [("Paris",), ("Rome",)]
+    items = [{"id": 1, "usd": 90}, {"id": 0, "usd": 120}, {"id": 0, "usd": 1}, {"id": 7, "usd": 5}, {"usd": 3}]
+    assert split_results(items, keys) == {("Paris",): {"usd": 120}, ("Rome",): {"usd": 90}}
+
+
+class StubGemini:
+    def __init__(self, reply):
+        self.text = json.dumps(reply)
+
+    def generate_content(self, prompt):
+        return self
+
+
+def test_invalid_item_in_a_gemini_batch_fails_only_its_caller(backend, monkeypatch):
+    reply = {"results": [
+        {"id": 0, "budget": 90, "standard": 160, "luxury": 420},
+        {"id": 1, "budget": "cheap", "standard": 140},
+        {"id": 2, "budget": 70, "standard": 120, "luxury": 300, "perNight": True},
+    ]}
+    monkeypatch.setattr(backend.genai, "GenerativeModel", lambda *args, **kwargs: StubGemini(reply))
+    batcher = LLMBatcher("hotels", backend._gemini_hotel_prices_batch, lambda destination: "unused", window=0.1)
+    paris, rome, oslo = (batcher.submit(name) for name in ("Paris", "Rome", "Oslo"))
+
+    assert paris.result(timeout=2) == {"budget": 90, "standard": 160, "luxury": 420, "currency": "USD",
+                                       "destination": "Paris", "perNight": True, "source": "ai"}
+    assert oslo.result(timeout=2)["luxury"] == 300
+    with pytest.raises(ValidationError):
+        rome.result(timeout=2)
@@ -0,0 +1,47 @@
+"""Tests for JSON extraction from LLM replies (python -m pytest test_llm_json.py)."""
+
+import pytest
+
+import llm_json
+from llm_json import LLMJSONError, extract_json, json_generation_config
+
+
+def test_plain_and_fenced_replies():
+    assert extract_json('{"city": "Paris"}') == {"city": "Paris"}
+    assert extract_json('Sure! Here it is:\n```json\n{"city": "Paris"}\n```\nEnjoy.') == {"city": "Paris"}
+
+
+def test_braces_inside_strings_and_prose_braces_are_ignored():
+    reply = 'Use {placeholders} like this: {"tip": "pack a {jacket}", "days": [1, 2]} ok?'
+    assert extract_json(reply) == {"tip": "pack a {jacket}", "days": [1, 2]}
+
+
+def test_arrays():
+    assert extract_json('Prices: [{"usd": 10}, {"usd": 12}]', expect=list) == [{"usd": 10}, {"usd": 12}]
+
+
+def test_repairs_trailing_commas_raw_newlines_and_bad_escapes():
+    reply = '{"notes": "line one\nline two", "path": "C:\\docs\\x", "days": [1, 2,],}'
+    assert extract_json(reply) == {"notes": "line one\nline two", "path": "C:\\docs\\x", "days": [1, 2]}
+
+
+def test_truncated_reply_keeps_complete_elements():
+    reply = '{"destination": "Rome", "dailyItinerary": [{"day": 1}, {"day": 2, "activities": ["Colos'
+    assert extract_json(reply) == {"destination": "Rome", "dailyItinerary": [{"day": 1}, {"day": 2, "activities": []}]}
+
+
+def test_unparseable_replies_raise_and_are_counted():
+    before = llm_json.stats()["failed"]
+    for reply in ("", "no json here", "{]"):
+        with pytest.raises(LLMJSONError):
+            extract_json(reply)
+    assert llm_json.stats()["failed"] == before + 3
+
+
+def test_json_generation_config():
+    base = {"temperature": 0.2}
+    config = json_generation_config(base, schema={"type": "object"})
+    assert config == {"temperature": 0.2, "response_mime_type": "application/json",
+                      "response_schema": {"type": "object"}}
+    assert base == {"temperature": 0.2}
+    assert "response_schema" not in json_generation_config()
@@ -0,0 +1,81 @@
+"""Tests for the Prometheus metrics registry and /metrics (python -m pytest test_metrics.py)."""
+
+from metrics import Registry, StageTimer
+
+
+def _samples(registry):
+    """{series: value} from a rendered registry, comment lines skipped."""
+    lines = [line for line in registry.render().splitlines() if not line.startswith("#")]
+    return dict(line.rsplit(" ", 1) for line in lines)
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry(prefix="test_")
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1, 0.5))
+    for value in (0.05, 0.1, 0.3, 0.7, 2.0, 9.0):
+        histogram.observe(value, "/quotes")
+
+    samples = _samples(registry)
+    assert samples['test_latency_seconds_bucket{route="/quotes",le="0.1"}'] == "2"  # le is inclusive
+    assert samples['test_latency_seconds_bucket{route="/quotes",le="0.5"}'] == "3"
+    assert samples['test_latency_seconds_bucket{route="/quotes",le="1"}'] == "4"
+    assert samples['test_latency_seconds_bucket{route="/quotes",le="+Inf"}'] == "6"
+    assert samples['test_latency_seconds_count{route="/quotes"}'] == "6"
+    assert float(samples['test_latency_seconds_sum{route="/quotes"}']) == sum((0.05, 0.1, 0.3, 0.7, 2.0, 9.0))
+
+
+def test_render_has_help_and_type_lines():
+    registry = Registry()
+    registry.counter("fallbacks_total", "Fallback responses", ("component",)).inc("flights")
+    registry.collector("circuit_state", "gauge", "Circuit state", ("upstream",), lambda: [(("gemini",), 2)])
+
+    lines = registry.render().splitlines()
+    assert lines[:3] == ["# HELP fallbacks_total Fallback responses", "# TYPE fallbacks_total counter",
+                         'fallbacks_total{component="flights"} 1']
+    assert lines[3:] == ["# HELP circuit_state Circuit state", "# TYPE circuit_state gauge",
+                         'circuit_state{upstream="gemini"} 2']
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.counter("errors_total", "Errors", ("reason",))
+    counter.inc('bad "quote"\\path\nnext')
+
+    assert 'errors_total{reason="bad \\"quote\\"\\\\path\\nnext"} 1' in registry.render().splitlines()
+
+
+def test_failing_collector_is_skipped():
+    registry = Registry()
+
+    def collect():
+        raise RuntimeError("stats unavailable")
+
+    registry.collector("broken", "gauge", "Broken", (), collect)
+    registry.counter("requests_total", "Requests").inc()
+    assert registry.render() == "# HELP requests_total Requests\n# TYPE requests_total counter\nrequests_total 1\n"
+
+
+def test_stage_timer_observes_each_stage():
+    registry = Registry()
+    stages = registry.histogram("stage_seconds", "Stage time", ("pipeline", "stage"))
+    timer = StageTimer(stages, "photo")
+    timer.mark("decode")
+    timer.mark("composite")
+    timer.finish()
+
+    samples = _samples(registry)
+    assert samples['stage_seconds_count{pipeline="photo",stage="decode"}'] == "1"
+    assert samples['stage_seconds_count{pipeline="photo",stage="composite"}'] == "1"
+
+
+def test_metrics_scrape_reports_route_latency_and_circuit_states(client):
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    assert 'travelsnap_http_request_seconds_count{route="/health",method="GET",status="200"}' in body
+    assert 'travelsnap_http_request_seconds_bucket{route="/health",method="GET",status="200",le="+Inf"}' in body
+    for upstream in ("serpapi", "gemini", "replicate"):
+        assert f'travelsnap_circuit_state{{upstream="{upstream}"}} 0' in body
@@ -0,0 +1,29 @@
+"""Request validation tests for the travel photo endpoints (python -m pytest test_photo_requests.py).
+
+Only malformed requests are sent, so nothing reaches Replicate or rembg.
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("route", ["/generate-travel-photo", "/generate-travel-photo/jobs"])
+@pytest.mark.parametrize("user_image", ["data:image/png;base64,abc", "not base64 at all!", 12345, {"x": 1}])
+def test_bad_user_image_is_a_json_400(client, route, user_image):
+    response = client.post(route, json={"userImage": user_image, "landmarkId": "eiffel"})
+    assert response.status_code == 400
+    assert response.is_json
+    assert "Invalid userImage" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("user_images", [["abc"], [None], ["data:image/png;base64,@@@@"]])
+def test_bad_batch_image_is_a_json_400(client, user_images):
+    response = client.post("/generate-travel-photo/batch", json={"userImages": user_images, "landmarkId": "eiffel"})
+    assert response.status_code == 400
+    assert response.is_json
+    assert "Invalid userImages" in response.get_json()["error"]
+
+
+def test_missing_user_image_is_still_reported(client):
+    response = client.post("/generate-travel-photo", json={"landmarkId": "eiffel"})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Missing user image"
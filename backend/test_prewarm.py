@@ -0,0 +1,41 @@
+"""Tests for the itinerary prewarmer (python -m pytest test_prewarm.py)."""
+
+import time
+
+from cache import MemoryCache, SQLiteCache, TieredCache
+from prewarm import ItineraryPrewarmer, itinerary_grid
+from rate_limit import TokenBucket
+
+
+def _prewarmer(cache):
+    grid = itinerary_grid(["Paris", "Rome", "Oslo"], [3], ["medium"], [()])
+    return ItineraryPrewarmer(
+        grid,
+        resolve=lambda body: (body, body["destination"].lower()),
+        build=lambda params, cache_key: cache.set(cache_key, {"city": params["destination"]}),
+        cache=cache,
+        bucket=TokenBucket(1000, capacity=10),
+        refresh_margin=60,
+    )
+
+
+def test_due_lists_missing_and_expiring_entries_without_touching_stats(tmp_path):
+    cache = TieredCache(MemoryCache(), SQLiteCache(str(tmp_path / "cache.db")))
+    cache.set("paris", {"city": "Paris"}, ttl=3600)
+    cache.set("rome", {"city": "Rome"}, ttl=30)  # inside the refresh margin
+
+    due = _prewarmer(cache).due()
+
+    assert sorted(cache_key for _, cache_key in due) == ["oslo", "rome"]
+    for stats in (cache.stats(), cache.memory.stats(), cache.shared.stats()):
+        assert stats["hits"] == 0 and stats["misses"] == 0
+
+
+def test_run_once_fills_the_cache():
+    cache = MemoryCache()
+    prewarmer = _prewarmer(cache)
+    prewarmer.run_once()
+
+    assert prewarmer.due() == []
+    assert cache.get("oslo") == {"city": "Oslo"}
+    assert cache.expiry("oslo") > time.time()
@@ -0,0 +1,48 @@
+"""Tests for the batch quote endpoint with stub fetchers (python -m pytest test_quotes.py)."""
+
+import pytest
+
+from cache import MemoryCache
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def hotels(backend, monkeypatch):
+    cache = ResponseCache(MemoryCache(), "hotels", ttl=60)
+    monkeypatch.setitem(backend.response_caches, "hotels", cache)
+    fetched = []
+
+    def fetch_hotel_prices(destination):
+        fetched.append(destination)
+        return {"standard": 150, "destination": destination}
+
+    monkeypatch.setattr(backend, "fetch_hotel_prices", fetch_hotel_prices)
+    return cache, fetched
+
+
+def _quotes(client, body):
+    return client.post("/get-quotes", json=body)
+
+
+def test_each_cold_lookup_is_one_miss(client, hotels):
+    hotels, fetched = hotels
+    response = _quotes(client, {"destinations": ["Paris", "Rome", "paris"], "sources": ["hotels"]})
+
+    assert response.status_code == 200
+    assert [quote["hotels"]["standard"] for quote in response.get_json()["quotes"]] == [150, 150]
+    assert sorted(fetched) == ["Paris", "Rome"]
+    assert hotels.stats()["misses"] == 2
+    assert hotels.cache.stats()["misses"] == 2  # one lookup per key, not one in cached() and one in get()
+
+    stats = _quotes(client, {"destinations": ["Paris", "Rome"], "sources": ["hotels"]}).get_json()["stats"]
+    assert stats["cached"] == 2 and stats["fetched"] == 0
+    assert hotels.stats()["hits"] == 2
+
+
+@pytest.mark.parametrize("sources", ["hotels", "flightshotels", {"hotels": True}])
+def test_sources_must_be_a_list(client, hotels, sources):
+    _, fetched = hotels
+    response = _quotes(client, {"destinations": ["Paris"], "sources": sources})
+    assert response.status_code == 400
+    assert "sources must be a list" in response.get_json()["error"]
+    assert fetched == []
@@ -0,0 +1,116 @@
+"""Tests for the token bucket and admission control (python -m pytest test_rate_limit.py)."""
+
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, RateLimitExceeded, TokenBucket
+
+
+def test_bucket_allows_a_burst_then_asks_callers_to_wait():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        bucket.reserve()
+    assert 0 < excinfo.value.retry_after <= 0.1
+
+    wait = bucket.reserve(max_wait=1)
+    assert 0 < wait <= 0.1
+
+
+def test_rejected_reservations_do_not_consume_tokens():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.reserve()
+    for _ in range(5):
+        with pytest.raises(RateLimitExceeded):
+            bucket.reserve()
+    assert bucket.available() == pytest.approx(0, abs=0.01)
+
+
+def test_concurrent_reservations_never_exceed_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    waits = []
+    lock = threading.Lock()
+
+    def reserve():
+        wait = bucket.reserve(max_wait=5)
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=reserve) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Ten tokens at 20/s from a bucket of one: waits are spaced 50ms apart
+    waits.sort()
+    assert waits[0] == 0
+    assert waits[-1] == pytest.approx(0.45, abs=0.05)
+    assert all(b - a == pytest.approx(0.05, abs=0.02) for a, b in zip(waits, waits[1:]))
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason="needs fcntl")
+def test_buckets_with_a_state_file_share_tokens(tmp_path):
+    path = str(tmp_path / "replicate.bucket")
+    worker_a = TokenBucket(rate=0.1, capacity=1, state_path=path)
+    worker_b = TokenBucket(rate=0.1, capacity=1, state_path=path)
+    worker_a.reserve()
+    with pytest.raises(RateLimitExceeded):
+        worker_b.reserve()
+
+
+def test_limiter_rejects_when_queue_is_full():
+    limiter = RateLimiter(TokenBucket(rate=5, capacity=1), max_queue=1, max_wait=0)
+    limiter.acquire()
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()
+
+    waiter = threading.Thread(target=limiter.acquire, kwargs={"max_wait": 2})
+    waiter.start()
+    time.sleep(0.05)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(max_wait=2)  # queue already holds one waiter
+    waiter.join()
+
+    stats = limiter.stats()
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 2
+    assert stats["maxQueueDepth"] == 1
+
+
+class SlowBucket(TokenBucket):
+    """Widens the gap between the queue check and the reservation."""
+
+    def reserve(self, max_wait=0.0):
+        time.sleep(0.05)
+        return super().reserve(max_wait)
+
+
+def test_concurrent_callers_never_overfill_the_queue():
+    limiter = RateLimiter(SlowBucket(rate=5, capacity=1), max_queue=2)
+    limiter.acquire()  # the bucket is now empty: everyone else has to queue
+    admitted = []
+    rejected = []
+    start = threading.Barrier(8)
+
+    def acquire():
+        start.wait()
+        try:
+            admitted.append(limiter.acquire(max_wait=5))
+        except RateLimitExceeded:
+            rejected.append(1)
+
+    threads = [threading.Thread(target=acquire) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(admitted) == 2 and len(rejected) == 6
+    stats = limiter.stats()
+    assert stats["maxQueueDepth"] <= 2
+    assert stats["queueDepth"] == 0
@@ -0,0 +1,89 @@
+"""Tests for the fuzzy destination resolver (python -m pytest test_resolver.py)."""
+
+import threading
+
+import pytest
+
+from destinations import DESTINATIONS, Destination, DestinationIndex
+from resolver import RESOLVER, DestinationResolver, FuzzyIndex, edit_distance, edit_budget
+
+
+@pytest.mark.parametrize("query, name", [
+    ("paris", "Paris"),
+    ("Paris, France", "Paris"),
+    ("Tokyo Japan", "Tokyo"),
+    ("barcelonna", "Barcelona"),
+    ("Barcleona", "Barcelona"),
+    ("new yrok", "New York"),
+    ("NYC", "New York"),
+    ("CDG", "Paris"),
+])
+def test_known_destinations_resolve(query, name):
+    assert RESOLVER.resolve(query).name == name
+
+
+@pytest.mark.parametrize("query", ["Bern", "Cairns", "York", "Atlantis"])
+def test_nearby_names_beyond_the_typo_budget_do_not_match(query):
+    assert RESOLVER.resolve(query) is None
+    assert RESOLVER.canonical(query) == query
+
+
+def test_edit_distance_counts_swaps_as_one_typo():
+    assert edit_distance("barcelona", "barcleona", 2) == 1
+    assert edit_distance("bern", "berlin", 2) == 2
+    assert edit_distance("cairns", "cairo", 2) == 2
+    assert edit_distance("york", "new york", 2) == 3  # capped at limit + 1
+    assert edit_distance("brouhei harbour", "brouhai harbour", 1) == 1
+
+
+def test_short_queries_get_fewer_typos():
+    assert [edit_budget(n) for n in (3, 4, 6, 7, 20)] == [0, 1, 1, 2, 2]
+
+    index = FuzzyIndex()
+    for name in ("Rome", "Berlin", "Barcelona"):
+        index.add(name, name)
+    assert index.search("Rom") == []
+    assert [value for _, _, value in index.search("Berlim")] == ["Berlin"]
+    assert index.search("Bern") == []
+    assert [value for _, _, value in index.search("Barcelnoa")] == ["Barcelona"]
+
+
+def test_closest_match_wins():
+    index = FuzzyIndex()
+    for name in ("Salzburg", "Strasbourg", "Sazburg"):
+        index.add(name, name)
+    assert [value for _, _, value in index.search("Salzburgg", limit=2)] == ["Salzburg", "Sazburg"]
+
+
+def test_index_is_rebuilt_when_the_dataset_changes():
+    dataset = DestinationIndex()
+    paris = DESTINATIONS.get("Paris")
+    dataset.add(paris)
+    resolver = DestinationResolver(dataset)
+    assert resolver.resolve("Lisbonn") is None
+
+    dataset.add(Destination("Lisbon", (), "LIS", paris.flight_price, paris.hotel, paris.climate, paris.events))
+    assert resolver.resolve("Lisbonn").name == "Lisbon"
+    assert resolver.iata("lisbon") == "LIS"
+
+
+def test_resolve_is_safe_while_the_cache_is_cleared():
+    resolver = DestinationResolver(DESTINATIONS, cache_size=4)
+    queries = ["paris", "rome", "tokyo", "barcelonna", "nyc", "london", "Bern"]
+    errors = []
+
+    def hammer():
+        try:
+            for _ in range(300):
+                for query in queries:
+                    resolver.resolve(query)
+        except Exception as e:  # a KeyError here would be the check-then-read race
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert resolver.stats()["cached"] <= 4
@@ -0,0 +1,84 @@
+"""Tests for the stale-while-revalidate response cache (python -m pytest test_response_cache.py)."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import MemoryCache
+from response_cache import ResponseCache, normalize_key
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_normalize_key_ignores_case_and_spacing():
+    assert normalize_key("  New   York ", "JFK") == normalize_key("new york", "jfk")
+
+
+def test_hit_after_miss():
+    cache = ResponseCache(MemoryCache(), "flights", ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"price": 420}
+
+    assert cache.get("paris", fetch) == {"price": 420}
+    assert cache.get("paris", fetch) == {"price": 420}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ResponseCache(MemoryCache(), "hotels", ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return ["Hotel"]
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda _: cache.get("rome", fetch), range(6)))
+    assert len(calls) == 1
+    assert results == [["Hotel"]] * 6
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    cache = ResponseCache(MemoryCache(), "weather", ttl=0.05, stale_ttl=60)
+    cache.get("oslo", lambda: "old")
+    time.sleep(0.1)
+    release = threading.Event()
+    refreshes = []
+
+    def refresh():
+        refreshes.append(1)
+        release.wait(2)
+        return "new"
+
+    assert cache.get("oslo", refresh) == "old"
+    assert cache.get("oslo", refresh) == "old"  # refresh still running: not started twice
+    release.set()
+    assert _wait_for(lambda: cache.cached("oslo", refresh) == "new")
+    assert len(refreshes) == 1
+    assert cache.stats()["staleHits"] >= 2
+
+
+def test_fallbacks_are_cached_briefly_and_never_replace_a_good_value():
+    cache = ResponseCache(MemoryCache(), "events", ttl=0.05, stale_ttl=60, negative_ttl=30,
+                          is_negative=lambda value: value == "fallback")
+    cache.get("lima", lambda: "good")
+    time.sleep(0.1)
+
+    cache.get("lima", lambda: "fallback")  # stale: the refresh fails over to a fallback
+    assert _wait_for(lambda: cache.stats()["refreshes"] == 1 and not cache._refreshing)
+    assert cache.get("lima", lambda: "unused") == "good"
+
+    assert cache.get("quito", lambda: "fallback") == "fallback"
+    assert cache.get("quito", lambda: "unused") == "fallback"
+    assert cache.stats()["negativeHits"] == 1
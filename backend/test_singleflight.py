@@ -0,0 +1,77 @@
+"""Tests for single-flight coalescing (python -m pytest test_singleflight.py)."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import singleflight
+from singleflight import SingleFlight
+
+
+def _slow(result, calls, seconds=0.2):
+    def fn():
+        calls.append(1)
+        time.sleep(seconds)
+        return result
+    return fn
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: flight.do("paris", _slow({"city": "Paris"}, calls)), range(8)))
+
+    assert len(calls) == 1
+    assert all(result == {"city": "Paris"} for result in results)
+    assert flight.stats()["leaders"] == 1
+    assert flight.stats()["coalesced"] == 7
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    calls = []
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda key: flight.do(key, _slow(key, calls)), ["a", "b", "c", "d"]))
+    assert len(calls) == 4
+
+
+def test_errors_reach_every_waiter_and_the_key_is_released():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", failing)
+        started.wait()
+        follower = pool.submit(flight.do, "k", lambda: "unused")
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert flight.do("k", lambda: "retried") == "retried"
+
+
+@pytest.mark.skipif(singleflight.fcntl is None, reason="needs fcntl")
+def test_cross_worker_lock_rechecks_the_shared_cache(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    calls = []
+
+    # Another worker holds the key's lock file for a moment
+    holder = SingleFlight(lock_dir=str(tmp_path))
+    with holder._file_lock("trip"):
+        thread = threading.Thread(target=lambda: calls.append(
+            flight.do("trip", lambda: "generated", recheck=lambda: "from shared cache")))
+        thread.start()
+        time.sleep(0.15)
+    thread.join()
+
+    assert calls == ["from shared cache"]
+    assert flight.stats()["crossWorkerHits"] == 1
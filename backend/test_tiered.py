@@ -0,0 +1,71 @@
+"""Tests for the hedged tiered executor (python -m pytest test_tiered.py)."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tiered import TieredExecutor
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _after(seconds, result):
+    def fn(city):
+        time.sleep(seconds)
+        if isinstance(result, Exception):
+            raise result
+        return result and f"{result}:{city}"
+    return fn
+
+
+def _fallback(city):
+    return f"estimate:{city}"
+
+
+def test_first_tier_answers(pool):
+    executor = TieredExecutor("flights", [("serpapi", _after(0, "serpapi"), 0.5),
+                                          ("gemini", _after(0, "gemini"), None)], _fallback, 1, pool)
+    assert executor.run("Paris") == "serpapi:Paris"
+    assert executor.stats()["servedBy"] == {"serpapi": 1, "gemini": 0, "fallback": 0}
+
+
+def test_slow_tier_is_hedged_and_the_faster_answer_wins(pool):
+    executor = TieredExecutor("flights", [("serpapi", _after(0.5, "serpapi"), 0.05),
+                                          ("gemini", _after(0.05, "gemini"), None)], _fallback, 2, pool)
+    started = time.monotonic()
+    assert executor.run("Rome") == "gemini:Rome"
+    assert time.monotonic() - started < 0.4
+    assert executor.stats()["hedges"] == 1
+
+
+@pytest.mark.parametrize("failure", [RuntimeError("quota"), None])
+def test_failed_or_empty_tier_starts_the_next_one_at_once(pool, failure):
+    executor = TieredExecutor("hotels", [("serpapi", _after(0, failure), None),
+                                         ("gemini", _after(0, "gemini"), None)], _fallback, 1, pool)
+    assert executor.run("Oslo") == "gemini:Oslo"
+    stats = executor.stats()
+    assert stats["hedges"] == 0
+    assert stats["tiers"]["serpapi"]["failures"] == 1
+
+
+def test_fallback_runs_when_nothing_answers_in_budget(pool):
+    executor = TieredExecutor("events", [("serpapi", _after(0.5, "serpapi"), None)], _fallback, 0.1, pool)
+    started = time.monotonic()
+    assert executor.run("Lima") == "estimate:Lima"
+    assert time.monotonic() - started < 0.3
+    assert executor.stats()["deadlineFallbacks"] == 1
+
+
+def test_hedge_delay_follows_observed_p95(pool):
+    executor = TieredExecutor("weather", [("serpapi", _after(0, "serpapi"), 1.0)], _fallback, 1, pool,
+                              min_samples=3)
+    tier = executor.tiers[0]
+    assert executor.hedge_delay(tier) == 1.0  # too few samples yet
+    tier.latencies.extend([0.1, 0.2, 0.3])
+    assert executor.hedge_delay(tier) == 0.3
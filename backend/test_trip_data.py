@@ -0,0 +1,69 @@
+"""Tests for the itinerary data-source fan-out (python -m pytest test_trip_data.py)."""
+
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def sources(backend, monkeypatch):
+    """Stub lookup_source: live data for every source, except ones listed in ``slow`` block until released."""
+    release = threading.Event()
+    slow = set()
+    calls = []
+
+    def lookup_source(source, destination, origin=None):
+        calls.append((source, destination, origin))
+        if source in slow:
+            release.wait(5)
+        return {"source": "live", "name": source}
+
+    monkeypatch.setattr(backend, "lookup_source", lookup_source)
+    yield slow, calls
+    release.set()
+
+
+def test_slow_source_past_the_deadline_gets_an_estimate(backend, sources):
+    slow, calls = sources
+    slow.add("weather")
+
+    trip_data = backend.gather_trip_data("Lisbon", "New York", deadline=0.2)
+
+    assert trip_data["weather"]["source"] == "estimate"
+    for name in ("flights", "hotels", "events"):
+        assert trip_data[name] == {"source": "live", "name": name}
+    assert sorted(calls) == sorted((name, "Lisbon", "New York") for name in ("flights", "hotels", "events", "weather"))
+
+
+def test_failed_source_gets_an_estimate(backend, monkeypatch):
+    def lookup_source(source, destination, origin=None):
+        if source == "hotels":
+            raise RuntimeError("serpapi down")
+        return {"source": "live"}
+
+    monkeypatch.setattr(backend, "lookup_source", lookup_source)
+    trip_data = backend.gather_trip_data("Lisbon", "New York", deadline=1)
+
+    assert trip_data["hotels"]["source"] == "estimate"
+    assert trip_data["flights"] == {"source": "live"}
+
+
+def test_data_sources_report(backend, sources):
+    slow, _ = sources
+    slow.update({"events", "flights"})
+
+    trip_data = backend.gather_trip_data("Lisbon", "New York", deadline=0.2)
+
+    assert backend._data_sources(trip_data) == {
+        "flights": "estimate", "hotels": "live", "events": "estimate", "weather": "live"}
+    assert backend._data_sources({"weather": {"temperature": 20}}) == {"weather": "real"}
+
+
+def test_origin_is_part_of_the_itinerary_cache_key(backend):
+    _, from_new_york = backend._itinerary_request({"destination": "Lisbon", "origin": "New York"})
+    _, from_london = backend._itinerary_request({"destination": "Lisbon", "origin": "London"})
+    _, default_origin = backend._itinerary_request({"destination": "Lisbon"})
+
+    assert from_new_york != from_london
+    assert from_new_york == default_origin
+    assert "london" in from_london
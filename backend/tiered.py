@@ -0,0 +1,150 @@
+"""Hedged, deadline-aware execution of tiered data sources.
+
+A lookup such as flight prices has several sources in order of preference
+(SerpAPI, then Gemini) and a local fallback that always answers.
+``TieredExecutor.run`` starts the first tier and, if it hasn't answered by
+its observed p95 latency, starts the next tier speculatively alongside it.
+A tier that fails or returns None starts the next one at once. The first
+valid answer wins. If no tier answers within the request's ``budget``, the
+fallback runs inline.
+
+Losing calls are cancelled if they haven't started yet. Running threads
+can't be interrupted: they finish in the background (bounded by their own
+HTTP timeouts) and their results are dropped, but their latencies still
+feed the p95.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class Tier:
+    def __init__(self, name, fn, hedge_after=None, window=200):
+        self.name = name
+        self.fn = fn
+        self.hedge_after = hedge_after  # seconds before enough samples exist; None = never hedge
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+
+    def p95(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class TieredExecutor:
+    def __init__(self, name, tiers, fallback, budget, pool, min_samples=20, window=200):
+        self.name = name
+        self.tiers = [Tier(tier_name, fn, hedge_after, window) for tier_name, fn, hedge_after in tiers]
+        self.fallback = fallback
+        self.budget = budget
+        self.pool = pool
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.deadline_fallbacks = 0
+        self.served_by = {tier.name: 0 for tier in self.tiers}
+        self.served_by["fallback"] = 0
+
+    def _hedge_delay(self, tier):
+        if tier.hedge_after is not None and len(tier.latencies) >= self.min_samples:
+            return tier.p95()
+        return tier.hedge_after
+
+    def hedge_delay(self, tier):
+        """Seconds to wait on ``tier`` before starting the next one (None = don't hedge)."""
+        with self._lock:
+            return self._hedge_delay(tier)
+
+    def _record(self, tier, started, future):
+        failed = future.cancelled() or future.exception() is not None or future.result() is None
+        with self._lock:
+            tier.latencies.append(time.monotonic() - started)
+            tier.calls += 1
+            if failed:
+                tier.failures += 1
+
+    def _launch(self, index, args, kwargs, pending):
+        tier = self.tiers[index]
+        started = time.monotonic()
+        future = self.pool.submit(tier.fn, *args, **kwargs)
+        future.add_done_callback(lambda f: self._record(tier, started, f))
+        pending[future] = index
+        return started
+
+    def _served(self, name):
+        with self._lock:
+            self.served_by[name] += 1
+
+    def run(self, *args, **kwargs):
+        """Return the first valid tier result within the budget, else the fallback's."""
+        with self._lock:
+            self.requests += 1
+        deadline = time.monotonic() + self.budget
+        pending = {}
+        next_index = 1
+        launched_at = self._launch(0, args, kwargs, pending)
+        hedge = self.hedge_delay(self.tiers[0])
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            hedge_at = launched_at + hedge if hedge is not None and next_index < len(self.tiers) else deadline
+            done, _ = wait(pending, timeout=max(0, min(deadline, hedge_at) - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                tier = self.tiers[pending.pop(future)]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"{self.name}: {tier.name} failed: {e}")
+                    result = None
+                if result is not None:
+                    for loser in pending:
+                        loser.cancel()
+                    self._served(tier.name)
+                    return result
+
+            if next_index < len(self.tiers) and (done or time.monotonic() >= hedge_at):
+                if not done:
+                    with self._lock:
+                        self.hedges += 1
+                    print(f"{self.name}: {self.tiers[next_index - 1].name} is slow, also trying {self.tiers[next_index].name}")
+                launched_at = self._launch(next_index, args, kwargs, pending)
+                hedge = self.hedge_delay(self.tiers[next_index])
+                next_index += 1
+
+        if pending:
+            for loser in pending:
+                loser.cancel()
+            with self._lock:
+                self.deadline_fallbacks += 1
+            print(f"{self.name}: no source answered within {self.budget}s, using fallback")
+        self._served("fallback")
+        return self.fallback(*args, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "servedBy": dict(self.served_by),
+                "hedges": self.hedges,
+                "deadlineFallbacks": self.deadline_fallbacks,
+                "tiers": {tier.name: self._tier_stats(tier) for tier in self.tiers},
+            }
+
+    def _tier_stats(self, tier):
+        p95 = tier.p95()
+        hedge = self._hedge_delay(tier)
+        return {
+            "calls": tier.calls,
+            "failures": tier.failures,
+            "p95Ms": round(p95 * 1000) if p95 is not None else None,
+            "hedgeAfterMs": round(hedge * 1000) if hedge is not None else None,
+        }